@@ -3,10 +3,13 @@ Automatic USDT sending to FixedFloat deposit addresses.
 Handles all checks, approvals, and transfers.
 """
 
+import asyncio
 import logging
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 from web3 import Web3
-from networks import get_network_config, get_blockchair_url
+from eth_account import Account
+from networks import NETWORKS, get_network_config, get_blockchair_url
 from erc20 import (
     get_web3_instance,
     get_usdt_balance,
@@ -16,9 +19,10 @@ from erc20 import (
     estimate_gas_for_approve,
     estimate_gas_for_transfer,
     check_allowance,
+    reset_nonce,
 )
-from wallet import load_keystore, decrypt_private_key
-from test_config import mask_sensitive_data
+from wallet import load_keystore, decrypt_private_key_bytes
+from test_config import mask_address, mask_sensitive_data
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,15 @@ GAS_PRICE_MULTIPLIER = 1.2
 # Minimum native token balance multiplier (for safety)
 MIN_NATIVE_MULTIPLIER = 1.5
 
+# RPCs are async (AsyncWeb3); the blocking work left in the send path - keystore file read and
+# the scrypt/pbkdf2 key derivation in decrypt - runs in this pool instead of on the event loop
+_BLOCKING_POOL = ThreadPoolExecutor(max_workers=len(NETWORKS), thread_name_prefix="autosend")
+
+
+async def _run_blocking(fn, *args):
+    """Run a blocking call in _BLOCKING_POOL and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(_BLOCKING_POOL, fn, *args)
+
 
 async def auto_send_usdt(
     network_key: str,
@@ -36,7 +49,8 @@ async def auto_send_usdt(
     required_amount: float,
     btc_address: str,
     order_id: str,
-    dry_run: bool = False
+    dry_run: bool = False,
+    balance_cache: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None
 ) -> Tuple[bool, Optional[str], Optional[str], str]:
     """
     Automatically send USDT to FixedFloat deposit address.
@@ -58,6 +72,8 @@ async def auto_send_usdt(
         btc_address: Expected BTC address (for validation)
         order_id: FixedFloat order ID
         dry_run: If True, don't broadcast transactions
+        balance_cache: Optional per-tick cache of (network_key, wallet) -> (usdt, native) balances,
+            shared between calls so repeated plans on one wallet don't repeat the RPCs
     
     Returns:
         Tuple of (success, approve_tx_hash, transfer_tx_hash, error_message)
@@ -68,22 +84,20 @@ async def auto_send_usdt(
     """
     try:
         # Load keystore (single wallet for all networks)
-        keystore = load_keystore(user_id)
+        keystore = await _run_blocking(load_keystore, user_id)
         if not keystore:
             return (False, None, None, f"Wallet not configured. Use /setwallet to configure.")
         
         # Decrypt private key (in memory only)
         try:
-            private_key_hex = decrypt_private_key(keystore, wallet_password)
-            private_key = "0x" + private_key_hex
+            private_key = await _run_blocking(decrypt_private_key_bytes, keystore, wallet_password)
         except ValueError as e:
             return (False, None, None, f"Incorrect wallet password: {e}")
         
-        from eth_account import Account
         account = Account.from_key(private_key)
         wallet_address = account.address
-        masked_wallet = f"{wallet_address[:6]}...{wallet_address[-4:]}" if len(wallet_address) > 10 else wallet_address
-        masked_deposit = f"{deposit_address[:6]}...{deposit_address[-4:]}" if len(deposit_address) > 10 else deposit_address
+        masked_wallet = mask_address(wallet_address)
+        masked_deposit = mask_address(deposit_address)
         
         logger.info(f"=== Auto-send USDT started ===")
         logger.info(f"Order ID: {order_id}")
@@ -94,7 +108,7 @@ async def auto_send_usdt(
         logger.info(f"Dry-run: {dry_run}")
         
         # Initialize Web3
-        w3 = get_web3_instance(network_key)
+        w3 = await get_web3_instance(network_key)
         config = get_network_config(network_key)
         
         # Check 1: Validate deposit address format
@@ -108,11 +122,20 @@ async def auto_send_usdt(
         
         # Check 2: Get balances
         logger.info(f"Check 2: Checking balances...")
+        balance_key = (network_key, wallet_address)
         try:
-            usdt_balance = get_usdt_balance(w3, network_key, wallet_address)
-            native_balance = get_native_balance(w3, wallet_address)
+            cached_balances = balance_cache.get(balance_key) if balance_cache is not None else None
+            if cached_balances is not None:
+                usdt_balance, native_balance = cached_balances
+            else:
+                usdt_balance, native_balance = await asyncio.gather(
+                    get_usdt_balance(w3, network_key, wallet_address),
+                    get_native_balance(w3, wallet_address),
+                )
+                if balance_cache is not None:
+                    balance_cache[balance_key] = (usdt_balance, native_balance)
             logger.info(f"✓ USDT balance: {usdt_balance:.6f} USDT")
-            logger.info(f"✓ Native balance: {native_balance:.6f} {config['native_token']}")
+            logger.info(f"✓ Native balance: {native_balance:.6f} {config.native_token}")
         except Exception as e:
             logger.error(f"✗ Failed to check balances: {e}")
             return (False, None, None, f"Failed to check balances: {e}")
@@ -131,14 +154,15 @@ async def auto_send_usdt(
         logger.info(f"✓ USDT balance sufficient")
         
         # Check 4: Estimate gas for both transactions
+        # (gas limits are reused below; gas price only until an approve has been sent)
         logger.info(f"Check 4: Estimating gas for transactions...")
         try:
-            approve_gas = estimate_gas_for_approve(w3, network_key, wallet_address, deposit_address_checksum, required_amount)
-            transfer_gas = estimate_gas_for_transfer(w3, network_key, wallet_address, deposit_address_checksum, required_amount)
+            approve_gas, transfer_gas, gas_price = await asyncio.gather(
+                estimate_gas_for_approve(w3, network_key, wallet_address, deposit_address_checksum, required_amount),
+                estimate_gas_for_transfer(w3, network_key, wallet_address, deposit_address_checksum, required_amount),
+                w3.eth.gas_price,
+            )
             total_gas = approve_gas + transfer_gas
-            
-            # Get gas price
-            gas_price = w3.eth.gas_price
             gas_price_gwei = w3.from_wei(gas_price, "gwei")
             total_gas_cost_wei = total_gas * gas_price * GAS_PRICE_MULTIPLIER
             total_gas_cost = w3.from_wei(total_gas_cost_wei, "ether")
@@ -149,8 +173,8 @@ async def auto_send_usdt(
             logger.info(f"  Transfer gas: {transfer_gas}")
             logger.info(f"  Total gas: {total_gas}")
             logger.info(f"  Gas price: {gas_price_gwei:.2f} Gwei")
-            logger.info(f"  Estimated cost: {total_gas_cost:.6f} {config['native_token']}")
-            logger.info(f"  Required (with margin): {min_native_required:.6f} {config['native_token']}")
+            logger.info(f"  Estimated cost: {total_gas_cost:.6f} {config.native_token}")
+            logger.info(f"  Required (with margin): {min_native_required:.6f} {config.native_token}")
         except Exception as e:
             logger.error(f"✗ Failed to estimate gas: {e}")
             return (False, None, None, f"Failed to estimate gas: {e}")
@@ -161,45 +185,54 @@ async def auto_send_usdt(
             logger.error(f"✗ Insufficient native token: required={min_native_required:.6f}, available={native_balance:.6f}")
             return (
                 False, None, None,
-                f"Insufficient {config['native_token']} balance for gas.\n"
-                f"Required: {min_native_required:.6f} {config['native_token']}\n"
-                f"Available: {native_balance:.6f} {config['native_token']}\n"
-                f"Shortage: {min_native_required - native_balance:.6f} {config['native_token']}"
+                f"Insufficient {config.native_token} balance for gas.\n"
+                f"Required: {min_native_required:.6f} {config.native_token}\n"
+                f"Available: {native_balance:.6f} {config.native_token}\n"
+                f"Shortage: {min_native_required - native_balance:.6f} {config.native_token}"
             )
         logger.info(f"✓ Native token balance sufficient")
         logger.info(f"=== All checks passed, proceeding with transactions ===")
         
+        # Balances are about to change - later plans in this tick must re-read them
+        if balance_cache is not None and not dry_run:
+            balance_cache.pop(balance_key, None)
+        
         # All checks passed - proceed with transactions
         approve_tx_hash = None
         
         # Check current allowance
         logger.info(f"Checking current USDT allowance...")
-        current_allowance = check_allowance(w3, network_key, wallet_address, deposit_address_checksum)
+        current_allowance = await check_allowance(w3, network_key, wallet_address, deposit_address_checksum)
         logger.info(f"Current allowance: {current_allowance:.6f} USDT")
         
         if current_allowance < required_amount:
             # Need to approve
             logger.info(f"Step 1: Approving {required_amount:.6f} USDT to {masked_deposit}")
             try:
-                approve_tx_hash = approve_usdt(
+                approve_tx_hash = await approve_usdt(
                     w3, network_key, private_key,
-                    deposit_address_checksum, required_amount, dry_run
+                    deposit_address_checksum, required_amount, dry_run,
+                    gas=approve_gas, gas_price=gas_price
                 )
                 
                 if dry_run:
                     logger.info(f"[DRY RUN] Approve step completed (no transaction sent)")
                 elif approve_tx_hash:
                     logger.info(f"Waiting for approve transaction confirmation...")
-                    receipt = w3.eth.wait_for_transaction_receipt(approve_tx_hash, timeout=120)
+                    receipt = await w3.eth.wait_for_transaction_receipt(approve_tx_hash, timeout=120)
                     if receipt.status != 1:
                         logger.error(f"✗ Approve transaction failed: {approve_tx_hash}")
+                        reset_nonce(network_key, wallet_address)
                         return (False, approve_tx_hash, None, "Approve transaction failed")
                     logger.info(f"✓ Approve transaction confirmed: {approve_tx_hash}, block={receipt.blockNumber}")
                 else:
                     logger.error(f"✗ Approve transaction returned None")
+                    reset_nonce(network_key, wallet_address)
                     return (False, None, None, "Approve transaction failed")
             except Exception as e:
                 logger.error(f"✗ Approve failed: {e}")
+                # Dropped, underpriced or timed out: re-read the nonce from the node next time
+                reset_nonce(network_key, wallet_address)
                 return (False, None, None, f"Approve failed: {e}")
         else:
             logger.info(f"✓ Sufficient allowance already exists: {current_allowance:.6f} USDT (no approve needed)")
@@ -207,9 +240,11 @@ async def auto_send_usdt(
         # Transfer USDT
         logger.info(f"Step 2: Transferring {required_amount:.6f} USDT to {masked_deposit}")
         try:
-            transfer_tx_hash = transfer_usdt(
+            transfer_tx_hash = await transfer_usdt(
                 w3, network_key, private_key,
-                deposit_address_checksum, required_amount, dry_run
+                deposit_address_checksum, required_amount, dry_run,
+                # After waiting for the approve receipt the pre-fetched price may be stale - re-read it
+                gas=transfer_gas, gas_price=gas_price if approve_tx_hash is None else None
             )
             
             if dry_run:
@@ -219,12 +254,14 @@ async def auto_send_usdt(
             
             if not transfer_tx_hash:
                 logger.error(f"✗ Transfer transaction returned None")
+                reset_nonce(network_key, wallet_address)
                 return (False, approve_tx_hash, None, "Transfer transaction failed")
             
             logger.info(f"Waiting for transfer transaction confirmation...")
-            receipt = w3.eth.wait_for_transaction_receipt(transfer_tx_hash, timeout=120)
+            receipt = await w3.eth.wait_for_transaction_receipt(transfer_tx_hash, timeout=120)
             if receipt.status != 1:
                 logger.error(f"✗ Transfer transaction failed: {transfer_tx_hash}")
+                reset_nonce(network_key, wallet_address)
                 return (False, approve_tx_hash, transfer_tx_hash, "Transfer transaction failed")
             
             logger.info(f"✓ Transfer transaction confirmed: {transfer_tx_hash}, block={receipt.blockNumber}")
@@ -238,6 +275,8 @@ async def auto_send_usdt(
             
         except Exception as e:
             logger.error(f"✗ Transfer failed: {e}")
+            # Dropped, underpriced or timed out: re-read the nonce from the node next time
+            reset_nonce(network_key, wallet_address)
             return (False, approve_tx_hash, None, f"Transfer failed: {e}")
     
     except Exception as e:
@@ -1,4 +1,5 @@
 import asyncio
+import copy
 import logging
 import os
 import hmac
@@ -6,22 +7,26 @@ import hashlib
 import json
 import time
 import re
-import requests
-from dotenv import load_dotenv
+from typing import Optional, Tuple
+import aiohttp
+import orjson
 import aiosqlite
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.storage.memory import MemoryStorage
-from networks import get_network_config, get_blockchair_url
+from eth_account import Account
+from test_config import ensure_dotenv
+from networks import NETWORKS, get_network_config, get_blockchair_url
 from wallet import (
     save_keystore, load_keystore,
     delete_keystore, get_wallet_address,
     save_password_to_keyring, load_password_from_keyring,
-    delete_password_from_keyring, keystore_exists
+    delete_password_from_keyring, keystore_exists, clear_password_cache,
+    clear_private_key_cache
 )
 from auto_send import auto_send_usdt
-from erc20 import get_web3_instance, get_usdt_balance, get_native_balance
+from erc20 import get_web3_instance, get_usdt_balance, get_native_balance, close_rpc_session
 
 # ============================================================================
 # НАСТРОЙКА И КОНФИГУРАЦИЯ
@@ -41,8 +46,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Загрузка переменных окружения из .env файла
-load_dotenv()
+# Загрузка переменных окружения из .env файла (test_config уже загрузил его при импорте - повторно не парсится)
+ensure_dotenv()
 
 # API ключи для FixedFloat (сервис обмена криптовалют)
 FF_API_KEY = os.getenv("FF_API_KEY")
@@ -69,25 +74,93 @@ NETWORK_CODES = {
     "USDT-MATIC": "USDTMATIC",
 }
 
+# Сети, которые принимает /setdca (ключи NETWORK_CODES не меняются при обновлении кодов)
+_ALLOWED_ASSETS = frozenset(NETWORK_CODES)
+
+# Сети бота и их исходные коды FixedFloat (для проверки доступности в /networks)
+_BOT_SUPPORTED = {
+    "USDT-ARB": "USDTARBITRUM",
+    "USDT-BSC": "USDTBSC",
+    "USDT-MATIC": "USDTMATIC"
+}
+_BOT_SUPPORTED_CODES = frozenset(_BOT_SUPPORTED.values())
+
 # ============================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ============================================================================
 
+# Читаемые названия стандартных интервалов (в часах)
+_INTERVAL_LABELS = {
+    12: "12 часов",
+    24: "день",
+    168: "неделю",
+    720: "месяц",
+}
+
+
 def format_interval(hours: int) -> str:
     """
     Преобразует интервал в часах в читаемый формат.
     Используется в нескольких местах для единообразия.
     """
-    if hours == 12:
-        return "12 часов"
-    elif hours == 24:
-        return "день"
-    elif hours == 168:
-        return "неделю"
-    elif hours == 720:
-        return "месяц"
-    else:
-        return f"{hours}ч"
+    label = _INTERVAL_LABELS.get(hours)
+    return label if label is not None else f"{hours}ч"
+
+
+def _fmt_left(seconds) -> str:
+    """
+    Оставшееся время в формате "2ч 15мин" (или "15мин", если меньше часа).
+    """
+    hours, rem = divmod(max(0, int(seconds)), 3600)
+    minutes = rem // 60
+    return f"{hours}ч {minutes}мин" if hours else f"{minutes}мин"
+
+
+def _mask_btc(address: str) -> str:
+    """
+    Короткая запись BTC адреса для сообщений: первые 10 и последние 6 символов.
+    """
+    return f"{address[:10]}...{address[-6:]}" if len(address) > 16 else address
+
+
+# Команды управления планом: /execute_2, /pause 1, /delete_3@botname
+# Разбор строгий: имя команды должно заканчиваться на _, пробел, @ или конец строки (/pausefoo не подходит),
+# суффикс захватывается целиком (в т.ч. /pause_-1, /pause_abc), упоминание бота - только @...bot
+# (юзернеймы ботов в Telegram оканчиваются на "bot"). Любая опечатка не превращается в "все планы"
+_PLAN_CMD_RE = re.compile(
+    r"^/(execute|pause|resume|delete)(?=[_\s@]|$)(?:_([^\s@]+))?(?i:@\w*bot)?(?:\s+(\S+))?$"
+)
+
+# Ответ на команду с неверным номером плана
+_PLAN_NUMBER_INVALID_MSG = (
+    "❌ Неверная команда или номер плана\n\n"
+    "Формат: /pause_1, /resume_1, /execute_1, /delete_1\n"
+    "Посмотри номера в /status"
+)
+
+
+def parse_plan_cmd(text: str) -> Tuple[str, Optional[int]]:
+    """
+    Разбирает команду управления планом.
+    Возвращает (команда, порядковый номер плана или None, если номер не указан).
+    Номер может быть любым целым (в т.ч. 0 или отрицательным) - проверка диапазона на стороне команды.
+    
+    Raises:
+        ValueError: команда не разобрана или номер не является целым числом
+    """
+    m = _PLAN_CMD_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"Неверная команда: {text!r}")
+    number = m.group(2) or m.group(3)
+    return m.group(1), int(number) if number else None
+
+
+# Legacy (P2PKH) - начинается с 1
+_BTC_LEGACY_RE = re.compile(r'^[1][a-km-zA-HJ-NP-Z1-9]{25,34}$')
+# SegWit (P2SH) - начинается с 3
+_BTC_SEGWIT_RE = re.compile(r'^[3][a-km-zA-HJ-NP-Z1-9]{25,34}$')
+# Native SegWit (Bech32) - начинается с bc1
+_BTC_BECH32_RE = re.compile(r'^(bc1)[a-z0-9]{39,87}$')
 
 
 def validate_btc_address(address: str) -> bool:
@@ -98,17 +171,10 @@ def validate_btc_address(address: str) -> bool:
     if not address:
         return False
     
-    # Legacy (P2PKH) - начинается с 1
-    legacy_pattern = r'^[1][a-km-zA-HJ-NP-Z1-9]{25,34}$'
-    # SegWit (P2SH) - начинается с 3
-    segwit_pattern = r'^[3][a-km-zA-HJ-NP-Z1-9]{25,34}$'
-    # Native SegWit (Bech32) - начинается с bc1
-    bech32_pattern = r'^(bc1)[a-z0-9]{39,87}$'
-    
     return bool(
-        re.match(legacy_pattern, address) or 
-        re.match(segwit_pattern, address) or 
-        re.match(bech32_pattern, address)
+        _BTC_LEGACY_RE.match(address) or 
+        _BTC_SEGWIT_RE.match(address) or 
+        _BTC_BECH32_RE.match(address)
     )
 
 
@@ -126,70 +192,62 @@ def ff_sign(data_str: str) -> str:
     ).hexdigest()
 
 
-def ff_request(method: str, params=None) -> dict:
+def _ff_mock_response(method: str, params: dict):
     """
-    Универсальный синхронный POST-запрос к FixedFloat API.
-    Supports mock mode for testing.
+    Ответ FixedFloat API в режиме MOCK_FIXEDFLOAT (без сетевых запросов).
+    """
+    logger.info(f"[MOCK] FixedFloat API запрос: {method} с параметрами {mask_sensitive_data(params)}")
+    
+    if method == "ccies":
+        mock_response = get_mock_fixedfloat_ccies()
+        logger.info(f"[MOCK] FixedFloat ответ: {method}")
+        # Общий ответ read-only: отдаём обычные dict, как у реального API (ff_request_cached делает deepcopy)
+        return [dict(item) for item in mock_response["data"]]
+    
+    elif method == "price":
+        network_key = params.get("fromCcy", "").replace("USDT", "USDT-")
+        if "ARBITRUM" in network_key.upper():
+            network_key = "USDT-ARB"
+        elif "BSC" in network_key.upper():
+            network_key = "USDT-BSC"
+        elif "MATIC" in network_key.upper() or "POLYGON" in network_key.upper():
+            network_key = "USDT-MATIC"
+        mock_response = get_mock_fixedfloat_price(network_key)
+        logger.info(f"[MOCK] FixedFloat ответ: {method}")
+        return mock_response["data"]
+    
+    elif method == "create":
+        # Extract network from fromCcy
+        from_ccy = params.get("fromCcy", "")
+        network_key = "USDT-ARB"  # default
+        if "ARBITRUM" in from_ccy.upper():
+            network_key = "USDT-ARB"
+        elif "BSC" in from_ccy.upper():
+            network_key = "USDT-BSC"
+        elif "MATIC" in from_ccy.upper() or "POLYGON" in from_ccy.upper():
+            network_key = "USDT-MATIC"
+        
+        amount = float(params.get("amount", 0))
+        btc_address = params.get("toAddress", "")
+        mock_response = get_mock_fixedfloat_order(network_key, amount, btc_address)
+        logger.info(f"[MOCK] FixedFloat ответ: {method}, order_id={mock_response['data']['id']}")
+        return mock_response["data"]
     
-    Args:
-        method: endpoint API (например: "ccies", "price", "create")
-        params: параметры запроса (dict)
+    else:
+        logger.warning(f"[MOCK] Unknown method {method}, returning empty data")
+        return {}
+
+
+def _ff_prepare_request(method: str, params: dict):
+    """
+    Формирует URL, тело и подписанные заголовки запроса к FixedFloat API.
     
     Returns:
-        dict с данными ответа от API
-    
-    Raises:
-        RuntimeError: если API вернул ошибку (code != 0)
+        (url, body, headers)
     """
-    # Mock mode - return mocked responses
-    if MOCK_FIXEDFLOAT:
-        logger.info(f"[MOCK] FixedFloat API запрос: {method} с параметрами {mask_sensitive_data(params)}")
-        
-        if method == "ccies":
-            mock_response = get_mock_fixedfloat_ccies()
-            logger.info(f"[MOCK] FixedFloat ответ: {method}")
-            return mock_response["data"]
-        
-        elif method == "price":
-            network_key = params.get("fromCcy", "").replace("USDT", "USDT-")
-            if "ARBITRUM" in network_key.upper():
-                network_key = "USDT-ARB"
-            elif "BSC" in network_key.upper():
-                network_key = "USDT-BSC"
-            elif "MATIC" in network_key.upper() or "POLYGON" in network_key.upper():
-                network_key = "USDT-MATIC"
-            mock_response = get_mock_fixedfloat_price(network_key)
-            logger.info(f"[MOCK] FixedFloat ответ: {method}")
-            return mock_response["data"]
-        
-        elif method == "create":
-            # Extract network from fromCcy
-            from_ccy = params.get("fromCcy", "")
-            network_key = "USDT-ARB"  # default
-            if "ARBITRUM" in from_ccy.upper():
-                network_key = "USDT-ARB"
-            elif "BSC" in from_ccy.upper():
-                network_key = "USDT-BSC"
-            elif "MATIC" in from_ccy.upper() or "POLYGON" in from_ccy.upper():
-                network_key = "USDT-MATIC"
-            
-            amount = float(params.get("amount", 0))
-            btc_address = params.get("toAddress", "")
-            mock_response = get_mock_fixedfloat_order(network_key, amount, btc_address)
-            logger.info(f"[MOCK] FixedFloat ответ: {method}, order_id={mock_response['data']['id']}")
-            return mock_response["data"]
-        
-        else:
-            logger.warning(f"[MOCK] Unknown method {method}, returning empty data")
-            return {}
-    
-    # Real API call
     if not FF_API_KEY or not FF_API_SECRET:
         raise ValueError("FF_API_KEY или FF_API_SECRET не заданы в .env")
 
-    if params is None:
-        params = {}
-
     url = f"{FF_API_URL}/{method}"
     data_str = json.dumps(params, separators=(",", ":"), ensure_ascii=False)
 
@@ -199,23 +257,16 @@ def ff_request(method: str, params=None) -> dict:
         "X-API-KEY": FF_API_KEY,
         "X-API-SIGN": ff_sign(data_str),
     }
+    return url, data_str.encode("utf-8"), headers
 
-    logger.info(f"FixedFloat API запрос: {method} с параметрами {mask_sensitive_data(params)}")
-    try:
-        resp = requests.post(url, data=data_str.encode("utf-8"), headers=headers, timeout=30)
-        resp.raise_for_status()  # Вызовет исключение для HTTP ошибок (4xx, 5xx)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка HTTP запроса к FixedFloat API: {e}")
-        raise RuntimeError(f"Ошибка подключения к FixedFloat API: {e}")
-    
-    logger.info(f"FixedFloat ответ: status={resp.status_code}")
 
-    try:
-        data = resp.json()
-    except ValueError as e:
-        logger.error(f"Ошибка парсинга JSON ответа от FixedFloat: {e}, response text: {resp.text[:200]}")
-        raise RuntimeError(f"Неверный формат ответа от FixedFloat API: {e}")
+def _ff_unwrap_response(data: dict):
+    """
+    Проверяет код ответа FixedFloat API и возвращает поле data.
     
+    Raises:
+        RuntimeError: если API вернул ошибку (code != 0)
+    """
     code = data.get("code")
     if code != 0:
         error_msg = data.get("msg", "Unknown error")
@@ -241,14 +292,208 @@ def ff_request(method: str, params=None) -> dict:
     return data["data"]
 
 
+# Общая HTTP сессия для FixedFloat API (keep-alive, кэш DNS); создаётся при первом запросе
+HTTP = None
+# Ограничение одновременных запросов к FixedFloat (у API свой rate limit)
+FF_MAX_CONCURRENT_REQUESTS = 10
+_FF_SEM = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую aiohttp сессию, создавая её при первом вызове.
+    Должна вызываться из работающего event loop.
+    """
+    global HTTP, _FF_SEM
+    if HTTP is None or HTTP.closed:
+        HTTP = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=20, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+    if _FF_SEM is None:
+        _FF_SEM = asyncio.Semaphore(FF_MAX_CONCURRENT_REQUESTS)
+    return HTTP
+
+
+async def close_http_session():
+    """Закрывает общую HTTP сессию при остановке бота"""
+    global HTTP
+    if HTTP is not None:
+        await HTTP.close()
+        HTTP = None
 
 
 async def ff_request_async(method: str, params=None) -> dict:
     """
-    Асинхронная обёртка над ff_request для неблокирующих вызовов API.
-    Выполняет синхронный запрос в отдельном потоке, чтобы не блокировать event loop бота.
+    Асинхронный POST-запрос к FixedFloat API через общую aiohttp сессию.
+    Не блокирует event loop и переиспользует TCP/TLS соединения между запросами.
+    Поведение (mock режим, ошибки) такое же как у ff_request.
+    """
+    if params is None:
+        params = {}
+
+    if MOCK_FIXEDFLOAT:
+        return _ff_mock_response(method, params)
+    
+    url, body, headers = _ff_prepare_request(method, params)
+    session = get_http_session()
+
+    logger.info(f"FixedFloat API запрос: {method} с параметрами {mask_sensitive_data(params)}")
+    try:
+        async with _FF_SEM:
+            async with session.post(url, data=body, headers=headers) as resp:
+                resp.raise_for_status()  # Вызовет исключение для HTTP ошибок (4xx, 5xx)
+                logger.info(f"FixedFloat ответ: status={resp.status}")
+                raw = await resp.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Ошибка HTTP запроса к FixedFloat API: {e}")
+        raise RuntimeError(f"Ошибка подключения к FixedFloat API: {e}")
+
+    try:
+        # orjson парсит в C и быстрее отпускает event loop (большие ответы вроде ccies)
+        data = orjson.loads(raw)
+    except ValueError as e:
+        logger.error(f"Ошибка парсинга JSON ответа от FixedFloat: {e}, response text: {raw[:200]!r}")
+        raise RuntimeError(f"Неверный формат ответа от FixedFloat API: {e}")
+    
+    return _ff_unwrap_response(data)
+
+
+# Кэш ответов read-only эндпоинтов FixedFloat ("price", "ccies")
+# Ключ: (method, params) -> (время получения, данные, ttl)
+# Протухшие записи удаляются при каждой записи: ключи "price" могут содержать суммы пользователей
+_ff_cache = {}
+# Запросы к API в полёте: ключ -> asyncio.Task. Все параллельные вызовы с одним ключом ждут одну задачу
+# (single-flight, в т.ч. при ошибке API); запись удаляется, когда задача завершилась
+_ff_inflight = {}
+
+
+async def _ff_fetch_and_store(key: tuple, method: str, params: dict, ttl: float):
+    """Один запрос к API для ff_request_cached: сохраняет ответ в кэш, попутно удаляя протухшие записи."""
+    data = await ff_request_async(method, params)
+    
+    now = time.monotonic()
+    for cached_key, (fetched_at, _, cached_ttl) in list(_ff_cache.items()):
+        if now - fetched_at >= cached_ttl:
+            del _ff_cache[cached_key]
+    _ff_cache[key] = (now, data, ttl)
+    return data
+
+
+def _ff_inflight_done(key: tuple, task: asyncio.Task):
+    """Убирает завершённую задачу из _ff_inflight."""
+    if _ff_inflight.get(key) is task:
+        del _ff_inflight[key]
+    # Ошибку получают ожидающие; если все они были отменены - не логируем "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+async def ff_request_cached(method: str, params=None, ttl: float = 30) -> dict:
+    """
+    ff_request_async с TTL кэшем для read-only эндпоинтов ("price", "ccies").
+    Пока ответ свежий - возвращается копия из кэша без запроса к API.
+    Одновременные запросы с одинаковыми параметрами ждут один вызов API (и его ошибку).
+    Ошибки не кэшируются.
+    
+    Args:
+        method: endpoint API
+        params: параметры запроса (dict)
+        ttl: время жизни ответа в кэше (секунды)
+    """
+    if params is None:
+        params = {}
+    key = (method, tuple(sorted(params.items())))
+    
+    cached = _ff_cache.get(key)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return copy.deepcopy(cached[1])
+    
+    task = _ff_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_ff_fetch_and_store(key, method, params, ttl))
+        _ff_inflight[key] = task
+        task.add_done_callback(lambda done, key=key: _ff_inflight_done(key, done))
+    
+    # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+    data = await asyncio.shield(task)
+    return copy.deepcopy(data)
+
+
+# Снимок лимитов и курсов для /limits, обновляется фоновой задачей price_refresher
+# Ключ: сеть из NETWORK_CODES -> {"min": ..., "rate": ...} или None при ошибке
+LIMITS_SNAPSHOT = {}
+# UNIX timestamp последнего обновления снимка (0 - ещё не обновлялся)
+LIMITS_SNAPSHOT_UPDATED = 0
+# Период обновления снимка (секунды)
+LIMITS_REFRESH_INTERVAL = 30
+# Текущее обновление снимка (asyncio.Task): параллельные вызовы ждут его, а не запускают своё
+_LIMITS_REFRESH_TASK = None
+
+
+async def refresh_limits_snapshot():
+    """
+    Обновляет LIMITS_SNAPSHOT. Если обновление уже идёт (price_refresher или /limits
+    другого пользователя на холодном старте) - ждёт его вместо нового опроса FixedFloat.
+    """
+    global _LIMITS_REFRESH_TASK
+    if _LIMITS_REFRESH_TASK is None or _LIMITS_REFRESH_TASK.done():
+        _LIMITS_REFRESH_TASK = asyncio.ensure_future(_refresh_limits_snapshot())
+    # shield: отмена одного ожидающего не прерывает общее обновление
+    await asyncio.shield(_LIMITS_REFRESH_TASK)
+
+
+async def _refresh_limits_snapshot():
     """
-    return await asyncio.to_thread(ff_request, method, params)
+    Запрашивает лимиты и курс USDT -> BTC для всех сетей параллельно
+    и обновляет LIMITS_SNAPSHOT.
+    """
+    global LIMITS_SNAPSHOT, LIMITS_SNAPSHOT_UPDATED
+    
+    results = await asyncio.gather(
+        *(
+            ff_request_cached("price", {
+                "type": "fixed",
+                "fromCcy": network_code,
+                "toCcy": "BTC",
+                "direction": "from",
+                "amount": 50,
+            }, ttl=LIMITS_REFRESH_INTERVAL)
+            for network_code in NETWORK_CODES.values()
+        ),
+        return_exceptions=True
+    )
+    
+    snapshot = {}
+    for network_name, data in zip(NETWORK_CODES, results):
+        if isinstance(data, Exception):
+            logger.error(f"Ошибка получения лимитов для {network_name}: {data}")
+            snapshot[network_name] = None
+            continue
+        
+        try:
+            from_info = data.get("from", {})
+            to_info = data.get("to", {})
+            min_amt = from_info.get("min", "—")
+            to_amount = to_info.get("amount", "—")
+            
+            # Вычисляем курс: сколько USDT за 1 BTC
+            if to_amount and to_amount != "—":
+                btc_amount = float(to_amount)  # BTC за 50 USDT
+                rate = 50.0 / btc_amount  # USDT за 1 BTC
+                rate_formatted = f"{rate:,.2f} USDT"
+            else:
+                rate_formatted = "—"
+            
+            snapshot[network_name] = {"min": min_amt, "rate": rate_formatted}
+        except Exception as e:
+            logger.error(f"Ошибка получения лимитов для {network_name}: {e}")
+            snapshot[network_name] = None
+    
+    LIMITS_SNAPSHOT = snapshot
+    LIMITS_SNAPSHOT_UPDATED = int(time.time())
 
 
 async def get_fixedfloat_limits(network_key: str) -> dict:
@@ -269,14 +514,15 @@ async def get_fixedfloat_limits(network_key: str) -> dict:
         raise ValueError(f"Неизвестная сеть: {network_key}")
     
     try:
-        # Используем price API для получения лимитов
-        data = await ff_request_async("price", {
+        # Используем price API для получения лимитов (тот же запрос и кэш, что у снимка для /limits:
+        # несколько планов одной сети за тик и price_refresher делят один ответ)
+        data = await ff_request_cached("price", {
             "type": "fixed",
             "fromCcy": from_ccy,
             "toCcy": "BTC",
             "direction": "from",
             "amount": 50,  # любая сумма для получения лимитов
-        })
+        }, ttl=LIMITS_REFRESH_INTERVAL)
         
         from_info = data.get("from", {})
         min_amt = from_info.get("min")
@@ -322,9 +568,15 @@ async def update_network_codes():
         logger.error(f"Ошибка обновления кодов сетей: {e}")
 
 
-def create_fixedfloat_order(network_key: str, amount_usdt: float, btc_address: str) -> dict:
+# Ограничение одновременных созданий ордеров (ручные /execute + scheduler)
+ORDER_MAX_CONCURRENT_CREATES = 5
+_ORDER_SEM = None
+
+
+async def create_fixedfloat_order_async(network_key: str, amount_usdt: float, btc_address: str) -> dict:
     """
     Универсальная функция создания ордера на обмен USDT -> BTC через FixedFloat.
+    Запрос идёт через общую aiohttp сессию (без отдельного потока).
     
     Args:
         network_key: ключ сети из NETWORK_CODES (например "USDT-ARB")
@@ -347,8 +599,14 @@ def create_fixedfloat_order(network_key: str, amount_usdt: float, btc_address: s
         "toAddress": btc_address,  # куда отправить BTC
     }
     
-    logger.info(f"Создание ордера: {amount_usdt} {from_ccy} -> BTC на {btc_address}")
-    return ff_request("create", params)
+    global _ORDER_SEM
+    if _ORDER_SEM is None:
+        _ORDER_SEM = asyncio.Semaphore(ORDER_MAX_CONCURRENT_CREATES)
+    
+    # Лишние вызовы ждут своей очереди, а не упираются в rate limit FixedFloat
+    async with _ORDER_SEM:
+        logger.info(f"Создание ордера: {amount_usdt} {from_ccy} -> BTC на {btc_address}")
+        return await ff_request_async("create", params)
 
 
 # ============================================================================
@@ -364,6 +622,58 @@ bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
 DB_PATH = os.getenv("DATABASE_PATH", "./dca.db")
 
+# Общее долгоживущее соединение с БД для обработчиков команд (открывается в main)
+DB = None
+# Сериализует записи через общее соединение (execute + commit не должны перемежаться)
+DB_WRITE_LOCK = None
+
+
+# Текущая версия схемы БД (хранится в PRAGMA user_version)
+# При добавлении новых колонок: увеличить версию и добавить шаг миграции в init_db
+SCHEMA_VERSION = 1
+
+# Колонки, добавленные в таблицы после их первой версии: (таблица, колонка, определение)
+SCHEMA_V1_COLUMNS = (
+    ("dca_plans", "active_order_id", "TEXT"),
+    ("dca_plans", "active_order_address", "TEXT"),
+    ("dca_plans", "active_order_amount", "TEXT"),
+    ("dca_plans", "active_order_expires", "INTEGER"),
+    ("dca_plans", "deleted", "BOOLEAN DEFAULT 0"),
+    ("dca_plans", "execution_state", "TEXT DEFAULT 'scheduled'"),
+    ("dca_plans", "last_tx_hash", "TEXT"),
+    ("sent_transactions", "state", "TEXT DEFAULT 'scheduled'"),
+    ("sent_transactions", "error_message", "TEXT"),
+    ("sent_transactions", "completed", "INTEGER DEFAULT 0"),
+)
+
+
+async def migrate_schema_v1(db):
+    """
+    Миграция БД без версии (user_version = 0) на версию 1.
+    Базы до введения user_version могут содержать любой набор колонок,
+    поэтому здесь (один раз) проверяется PRAGMA table_info.
+    """
+    existing_columns = {}
+    for table in {table for table, _, _ in SCHEMA_V1_COLUMNS}:
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            existing_columns[table] = {col[1] for col in await cursor.fetchall()}
+    
+    for table, column, definition in SCHEMA_V1_COLUMNS:
+        if column not in existing_columns[table]:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    # Переносим отметки о завершении из legacy таблицы completed_orders (если она есть)
+    if "completed" not in existing_columns["sent_transactions"]:
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'completed_orders'"
+        ) as cursor:
+            has_completed_orders = await cursor.fetchone()
+        if has_completed_orders:
+            await db.execute(
+                "UPDATE sent_transactions SET completed = 1 "
+                "WHERE order_id IN (SELECT order_id FROM completed_orders)"
+            )
+
 
 async def init_db():
     """
@@ -386,6 +696,10 @@ async def init_db():
     - Уникальность: может быть до 3 планов на одну сеть (user_id + from_asset)
     """
     async with aiosqlite.connect(DB_PATH) as db:
+        # Вся схема (таблицы, миграции, индексы) - одна транзакция и один fsync:
+        # без BEGIN каждый DDL-оператор коммитится отдельно
+        await db.execute("BEGIN")
+        
         # Создаём таблицу если её нет
         await db.execute('''
             CREATE TABLE IF NOT EXISTS dca_plans (
@@ -406,27 +720,8 @@ async def init_db():
             )
         ''')
         
-        # Проверяем существующие столбцы и добавляем новые если их нет
-        async with db.execute("PRAGMA table_info(dca_plans)") as cursor:
-            columns = await cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
-        
-        if "active_order_id" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN active_order_id TEXT")
-        if "active_order_address" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN active_order_address TEXT")
-        if "active_order_amount" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN active_order_amount TEXT")
-        if "active_order_expires" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN active_order_expires INTEGER")
-        if "deleted" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN deleted BOOLEAN DEFAULT 0")
-        if "execution_state" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN execution_state TEXT DEFAULT 'scheduled'")
-        if "last_tx_hash" not in existing_columns:
-            await db.execute("ALTER TABLE dca_plans ADD COLUMN last_tx_hash TEXT")
-        
         # Создаём таблицу для хранения информации о кошельках (single wallet per user)
+        # Note: legacy колонку encrypted_password не удаляем - SQLite doesn't support DROP COLUMN easily
         await db.execute('''
             CREATE TABLE IF NOT EXISTS wallets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -436,13 +731,6 @@ async def init_db():
             )
         ''')
         
-        # Удаляем encrypted_password если он существует (legacy migration)
-        async with db.execute("PRAGMA table_info(wallets)") as cursor:
-            columns = await cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
-        
-        # Note: SQLite doesn't support DROP COLUMN easily, so we'll just ignore it
-        
         # Создаём таблицу для отслеживания отправленных транзакций
         # State tracking for idempotency and restart safety
         await db.execute('''
@@ -459,32 +747,49 @@ async def init_db():
                 state TEXT DEFAULT 'scheduled',
                 error_message TEXT,
                 sent_at INTEGER DEFAULT (strftime('%s','now')),
+                completed INTEGER DEFAULT 0,
                 FOREIGN KEY(plan_id) REFERENCES dca_plans(id)
             )
         ''')
         
-        # Migrate sent_transactions table to add state and error_message columns if missing
-        async with db.execute("PRAGMA table_info(sent_transactions)") as cursor:
-            columns = await cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
+        # Миграции запускаются только если версия схемы в файле БД устарела
+        async with db.execute("PRAGMA user_version") as cursor:
+            current_version = (await cursor.fetchone())[0]
         
-        if "state" not in existing_columns:
-            await db.execute("ALTER TABLE sent_transactions ADD COLUMN state TEXT DEFAULT 'scheduled'")
-        if "error_message" not in existing_columns:
-            await db.execute("ALTER TABLE sent_transactions ADD COLUMN error_message TEXT")
+        if current_version < SCHEMA_VERSION:
+            if current_version < 1:
+                await migrate_schema_v1(db)
+            await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            logger.info(f"Схема БД обновлена: версия {current_version} -> {SCHEMA_VERSION}")
         
-        # Создаём таблицу для отслеживания завершённых ордеров
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS completed_orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                order_id TEXT NOT NULL UNIQUE,
-                btc_txid TEXT,
-                notified INTEGER DEFAULT 0,
-                completed_at INTEGER,
-                FOREIGN KEY(user_id) REFERENCES dca_plans(user_id)
-            )
-        ''')
+        # Частичный индекс: order_monitor читает только незавершённые транзакции
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sent_pending ON sent_transactions(completed, sent_at) "
+            "WHERE completed = 0"
+        )
+        
+        # Списки планов пользователя (WHERE user_id = ? AND deleted = 0 ORDER BY id)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plans_user_active ON dca_plans(user_id, deleted, id)"
+        )
+        
+        # Проверки /setdca: число планов в сети и поиск такого же плана (сеть + сумма + интервал)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plans_lookup "
+            "ON dca_plans(user_id, from_asset, deleted, amount, interval_hours)"
+        )
+        
+        # Самый свежий ордер удалённого плана с теми же параметрами - без сортировки
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plans_expires "
+            "ON dca_plans(user_id, from_asset, amount, interval_hours, deleted, active_order_expires DESC)"
+        )
+        
+        # Частичный индекс: dca_scheduler выбирает только активные планы, которым пора запускаться
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_plans_due ON dca_plans(next_run) "
+            "WHERE active = 1 AND deleted = 0"
+        )
         
         await db.commit()
     logger.info("База данных инициализирована")
@@ -494,6 +799,79 @@ async def init_db():
 # DCA SCHEDULER - автоматическое выполнение планов
 # ============================================================================
 
+# Шаблоны уведомлений планировщика (собираются один раз при импорте)
+SCHEDULER_AUTO_SEND_MSG = (
+    "✅ DCA plan executed!\n\n"
+    "🆔 Order: {order_id}\n"
+    "🔗 Link: {order_url}\n\n"
+    "⏳ Auto-sending USDT..."
+)
+SCHEDULER_BLOCKED_MSG = (
+    "⚠️ Network/RPC error - execution blocked\n\n"
+    "🆔 Order: {order_id}\n"
+    "Error: {error}\n\n"
+    "Will retry when next DCA interval is reached ({interval_hours}h).\n"
+    "Or use /execute to retry manually."
+)
+SCHEDULER_MANUAL_SEND_MSG = (
+    "✅ DCA plan executed!\n\n"
+    "🆔 Order: {order_id}\n"
+    "🔗 Link: {order_url}\n\n"
+    "💵 Send: {deposit_amount} {deposit_code}\n"
+    "📍 Deposit address:\n{deposit_address}\n\n"
+    "⏰ Order valid for: {time_text}\n\n"
+    "💡 For auto-send, setup wallet:\n"
+    "/setwallet"
+)
+
+
+async def open_db():
+    """
+    Открывает общее соединение с БД для обработчиков команд.
+    WAL позволяет читать параллельно с записью фоновых задач.
+    """
+    global DB, DB_WRITE_LOCK
+    DB = await aiosqlite.connect(DB_PATH)
+    await DB.execute("PRAGMA journal_mode=WAL")
+    await DB.execute("PRAGMA synchronous=NORMAL")
+    await DB.execute("PRAGMA temp_store=MEMORY")
+    await DB.execute("PRAGMA cache_size=-20000")
+    await DB.commit()
+    DB_WRITE_LOCK = asyncio.Lock()
+
+
+async def close_db():
+    """Закрывает общее соединение с БД при остановке бота"""
+    global DB
+    if DB is not None:
+        await DB.close()
+        DB = None
+
+
+async def _reschedule(db, plan_id: int, next_run: int):
+    """Переносит next_run плана и сразу фиксирует транзакцию."""
+    await db.execute("UPDATE dca_plans SET next_run = ? WHERE id = ?", (next_run, plan_id))
+    await db.commit()
+
+
+async def _notify_and_reschedule(db, user_id: int, plan_id: int, next_run: int, text: str):
+    """
+    Переносит next_run плана (UPDATE + commit) и параллельно отправляет уведомление.
+    Commit не ждёт Telegram: блокировка записи SQLite не держится на время отправки.
+    Ошибка отправки (бот заблокирован пользователем, flood limit) только логируется:
+    перенос фиксируется в любом случае, иначе план повторился бы на следующем тике.
+    """
+    reschedule_result, send_result = await asyncio.gather(
+        _reschedule(db, plan_id, next_run),
+        bot.send_message(user_id, text),
+        return_exceptions=True
+    )
+    if isinstance(reschedule_result, BaseException):
+        raise reschedule_result
+    if isinstance(send_result, BaseException):
+        logger.error(f"Не удалось отправить уведомление user_id={user_id}, plan_id={plan_id}: {send_result}")
+
+
 async def dca_scheduler():
     """
     Фоновая задача для автоматического выполнения DCA планов.
@@ -507,6 +885,8 @@ async def dca_scheduler():
             await asyncio.sleep(60)  # проверка каждую минуту
             
             now = int(time.time())
+            # Балансы кошельков в пределах одного тика: (network_key, address) -> (usdt, native)
+            balance_cache = {}
             
             async with aiosqlite.connect(DB_PATH) as db:
                 # Получаем все активные планы, которые пора выполнить (с ID!)
@@ -584,48 +964,33 @@ async def dca_scheduler():
                             
                             if amount < min_limit or amount > effective_max:
                                 logger.warning(f"Сумма {amount} вне лимитов для {from_asset}: min={min_limit:.2f}, max={effective_max:.2f}")
-                                # Отправляем уведомление пользователю
-                                await bot.send_message(
-                                    user_id,
+                                # Откладываем на следующий интервал и уведомляем пользователя
+                                # (уведомление и UPDATE независимы - выполняем параллельно)
+                                new_next_run = now + (interval_hours * 3600)
+                                await _notify_and_reschedule(
+                                    db, user_id, plan_id, new_next_run,
                                     f"❌ Ошибка выполнения DCA плана:\n\n"
                                     f"Сумма {amount:.2f} USDT вне допустимых лимитов для {from_asset}\n"
                                     f"Минимум: {min_limit:.2f} USDT\n"
                                     f"Максимум: {effective_max:.2f} USDT\n\n"
                                     f"💡 Обнови план с корректной суммой"
                                 )
-                                # Откладываем на следующий интервал
-                                new_next_run = now + (interval_hours * 3600)
-                                await db.execute(
-                                    "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                    (new_next_run, plan_id)
-                                )
-                                await db.commit()
                                 continue
                         except RuntimeError as e:
                             error_msg = str(e)
                             logger.error(f"Ошибка проверки лимитов для plan_id={plan_id}: {e}")
                             # Если сеть недоступна, пропускаем этот запуск
                             if "недоступна" in error_msg.lower() or "311" in error_msg or "312" in error_msg:
-                                await bot.send_message(
-                                    user_id,
+                                new_next_run = now + (interval_hours * 3600)
+                                await _notify_and_reschedule(
+                                    db, user_id, plan_id, new_next_run,
                                     f"⚠️ Сеть {from_asset} недоступна на FixedFloat в данный момент\n\n"
                                     f"План будет повторён через {interval_hours}ч"
                                 )
-                                new_next_run = now + (interval_hours * 3600)
-                                await db.execute(
-                                    "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                    (new_next_run, plan_id)
-                                )
-                                await db.commit()
                                 continue
                         
                         # Создаём ордер на обмен
-                        order_data = await asyncio.to_thread(
-                            create_fixedfloat_order,
-                            from_asset,
-                            amount,
-                            btc_address
-                        )
+                        order_data = await create_fixedfloat_order_async(from_asset, amount, btc_address)
                         
                         order_id = order_data.get("id")
                         from_obj = order_data.get("from", {}) or {}
@@ -638,9 +1003,7 @@ async def dca_scheduler():
                         if not isinstance(time_left, (int, float)) or time_left < 0:
                             time_left = 0
                         order_expires = int(time.time()) + int(time_left)
-                        hours = time_left // 3600
-                        minutes = (time_left % 3600) // 60
-                        time_text = f"{hours}ч {minutes}мин" if hours > 0 else f"{minutes}мин"
+                        time_text = _fmt_left(time_left)
                         
                         # Формируем ссылку на ордер
                         order_url = f"https://fixedfloat.com/order/{order_id}"
@@ -676,15 +1039,21 @@ async def dca_scheduler():
                                 "INSERT INTO sent_transactions (user_id, plan_id, order_id, network_key, amount, deposit_address, state) VALUES (?, ?, ?, ?, ?, ?, 'sending')",
                                 (user_id, plan_id, order_id, from_asset, required_amount, deposit_address)
                             )
-                            await db.commit()
                             
-                            await bot.send_message(
-                                user_id,
-                                f"✅ DCA plan executed!\n\n"
-                                f"🆔 Order: {order_id}\n"
-                                f"🔗 Link: {order_url}\n\n"
-                                f"⏳ Auto-sending USDT..."
+                            # Информационное сообщение не зависит от результата commit - отправляем параллельно.
+                            # Ошибка отправки только логируется: она не должна отменять саму отправку USDT
+                            commit_result, send_result = await asyncio.gather(
+                                db.commit(),
+                                bot.send_message(
+                                    user_id,
+                                    SCHEDULER_AUTO_SEND_MSG.format(order_id=order_id, order_url=order_url)
+                                ),
+                                return_exceptions=True
                             )
+                            if isinstance(commit_result, BaseException):
+                                raise commit_result
+                            if isinstance(send_result, BaseException):
+                                logger.error(f"Не удалось отправить уведомление user_id={user_id}, order_id={order_id}: {send_result}")
                             
                             # Автоматическая отправка USDT
                             try:
@@ -696,7 +1065,8 @@ async def dca_scheduler():
                                     required_amount=required_amount,
                                     btc_address=btc_address,
                                     order_id=order_id,
-                                    dry_run=DRY_RUN
+                                    dry_run=DRY_RUN,
+                                    balance_cache=balance_cache
                                 )
                             except Exception as send_error:
                                 # RPC/Network error - mark as blocked, don't advance schedule
@@ -717,11 +1087,11 @@ async def dca_scheduler():
                                     
                                     await bot.send_message(
                                         user_id,
-                                        f"⚠️ Network/RPC error - execution blocked\n\n"
-                                        f"🆔 Order: {order_id}\n"
-                                        f"Error: {error_str[:200]}\n\n"
-                                        f"Will retry when next DCA interval is reached ({interval_hours}h).\n"
-                                        f"Or use /execute to retry manually."
+                                        SCHEDULER_BLOCKED_MSG.format(
+                                            order_id=order_id,
+                                            error=error_str[:200],
+                                            interval_hours=interval_hours
+                                        )
                                     )
                                     # DO NOT advance schedule - will retry
                                     continue
@@ -731,22 +1101,16 @@ async def dca_scheduler():
                                         "UPDATE sent_transactions SET state = 'failed', error_message = ? WHERE order_id = ? AND plan_id = ?",
                                         (error_str[:500], order_id, plan_id)
                                     )
-                                    await db.commit()
                                     
-                                    await bot.send_message(
-                                        user_id,
+                                    # Advance schedule for failed transactions (concurrently with notification)
+                                    new_next_run = now + (interval_hours * 3600)
+                                    await _notify_and_reschedule(
+                                        db, user_id, plan_id, new_next_run,
                                         f"❌ Auto-send failed\n\n"
                                         f"🆔 Order: {order_id}\n"
                                         f"Error: {error_str[:200]}\n\n"
                                         f"Please send manually."
                                     )
-                                    # Advance schedule for failed transactions
-                                    new_next_run = now + (interval_hours * 3600)
-                                    await db.execute(
-                                        "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                        (new_next_run, plan_id)
-                                    )
-                                    await db.commit()
                                     continue
                             
                             if success:
@@ -758,7 +1122,7 @@ async def dca_scheduler():
                                 )
                                 await db.commit()
                                 
-                                explorer_base = config["explorer_base"]
+                                explorer_base = config.explorer_base
                                 transfer_url = f"{explorer_base}{transfer_tx}" if transfer_tx else None
                                 
                                 msg = (
@@ -779,17 +1143,11 @@ async def dca_scheduler():
                                 if DRY_RUN:
                                     msg += f"\n⚠️ DRY RUN MODE - transactions not broadcast"
                                 
-                                await bot.send_message(user_id, msg)
+                                # Advance schedule ONLY on successful send (concurrently with notification)
+                                new_next_run = now + (interval_hours * 3600)
+                                await _notify_and_reschedule(db, user_id, plan_id, new_next_run, msg)
                                 
                                 logger.info(f"Auto-send successful: order_id={order_id}, approve_tx={approve_tx}, transfer_tx={transfer_tx}")
-                                
-                                # Advance schedule ONLY on successful send
-                                new_next_run = now + (interval_hours * 3600)
-                                await db.execute(
-                                    "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                    (new_next_run, plan_id)
-                                )
-                                await db.commit()
                             else:
                                 # Check if error is retryable
                                 is_retryable = any(keyword in error_msg.lower() for keyword in 
@@ -805,11 +1163,11 @@ async def dca_scheduler():
                                     
                                     await bot.send_message(
                                         user_id,
-                                        f"⚠️ Network/RPC error - execution blocked\n\n"
-                                        f"🆔 Order: {order_id}\n"
-                                        f"Error: {error_msg[:200]}\n\n"
-                                        f"Will retry when next DCA interval is reached ({interval_hours}h).\n"
-                                        f"Or use /execute to retry manually."
+                                        SCHEDULER_BLOCKED_MSG.format(
+                                            order_id=order_id,
+                                            error=error_msg[:200],
+                                            interval_hours=interval_hours
+                                        )
                                     )
                                     # DO NOT advance schedule
                                     continue
@@ -819,7 +1177,6 @@ async def dca_scheduler():
                                         "UPDATE sent_transactions SET state = 'failed', error_message = ? WHERE order_id = ? AND plan_id = ?",
                                         (error_msg[:500], order_id, plan_id)
                                     )
-                                    await db.commit()
                                     
                                     error_notification = (
                                         f"❌ Failed to auto-send USDT\n\n"
@@ -831,36 +1188,26 @@ async def dca_scheduler():
                                         f"📍 To:\n{deposit_address}\n\n"
                                         f"⏰ Order valid for: {time_text}"
                                     )
-                                    await bot.send_message(user_id, error_notification)
                                     logger.error(f"Auto-send failed for order {order_id}: {error_msg}")
                                     
-                                    # Advance schedule ONLY for failed (non-retryable) errors
+                                    # Advance schedule ONLY for failed (non-retryable) errors (concurrently with notification)
                                     new_next_run = now + (interval_hours * 3600)
-                                    await db.execute(
-                                        "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                        (new_next_run, plan_id)
-                                    )
-                                    await db.commit()
+                                    await _notify_and_reschedule(db, user_id, plan_id, new_next_run, error_notification)
                         else:
                             # Wallet not configured - ask to send manually
-                            await bot.send_message(
-                                user_id,
-                                f"✅ DCA plan executed!\n\n"
-                                f"🆔 Order: {order_id}\n"
-                                f"🔗 Link: {order_url}\n\n"
-                                f"💵 Send: {deposit_amount} {deposit_code}\n"
-                                f"📍 Deposit address:\n{deposit_address}\n\n"
-                                f"⏰ Order valid for: {time_text}\n\n"
-                                f"💡 For auto-send, setup wallet:\n"
-                                f"/setwallet"
-                            )
                             # Advance schedule for manual send case (order created, user notified)
                             new_next_run = now + (interval_hours * 3600)
-                            await db.execute(
-                                "UPDATE dca_plans SET next_run = ? WHERE id = ?",
-                                (new_next_run, plan_id)
+                            await _notify_and_reschedule(
+                                db, user_id, plan_id, new_next_run,
+                                SCHEDULER_MANUAL_SEND_MSG.format(
+                                    order_id=order_id,
+                                    order_url=order_url,
+                                    deposit_amount=deposit_amount,
+                                    deposit_code=deposit_code,
+                                    deposit_address=deposit_address,
+                                    time_text=time_text
+                                )
                             )
-                            await db.commit()
                         
                         logger.info(f"DCA execution completed for plan_id={plan_id}, user_id={user_id}, order_id={order_id}")
                         
@@ -894,6 +1241,92 @@ async def dca_scheduler():
 # ============================================================================
 
 
+# Приветствие /start ({username} подставляется при каждом вызове)
+START_TEMPLATE = (
+    "👋 Привет, @{username}!\n\n"
+    "🤖 AutoDCA Bot - Автоматическая покупка BTC через FixedFloat\n\n"
+    "📋 Доступные команды:\n\n"
+    "🔧 Настройка:\n"
+    "/setwallet — настроить кошелёк\n"
+    "/setdca — создать DCA план\n"
+    "/status — статус планов\n"
+    "/pause — приостановить план\n"
+    "/resume — возобновить план\n"
+    "/delete — удалить план\n\n"
+    "💱 Ручные операции:\n"
+    "/execute — выполнить план вручную\n"
+    "/networks — доступные сети\n"
+    "/limits — лимиты обмена\n\n"
+    "ℹ️ Информация:\n"
+    "/help — подробная справка\n"
+    "/walletstatus — баланс кошелька\n"
+    "/history — история операций\n"
+    "/ping — проверка бота\n\n"
+    "💡 Начни с /setwallet для настройки кошелька!"
+)
+
+# Справка /help (статичный текст, собирается один раз при импорте)
+HELP_TEXT = (
+    "📖 AutoDCA Bot — Локальный Telegram бот для DCA\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "🔐 Настройка кошелька (один раз)\n"
+    "━━━━━━━━━━━━━━━━━━\n\n"
+    "1. Создай wallet.json в папке с ботом:\n\n"
+    "```json\n"
+    "{\n"
+    '  "private_key": "0xYOUR_PRIVATE_KEY",\n'
+    '  "password": "YOUR_PASSWORD"\n'
+    "}\n"
+    "```\n\n"
+    "2. Запусти:\n"
+    "/setwallet\n\n"
+    "Готово! Кошелёк настроен.\n\n"
+    "⚠️ ВАЖНО:\n"
+    "• wallet.json создаётся ОДИН РАЗ\n"
+    "• Приватный ключ удаляется после создания keystore\n"
+    "• Пароль хранится в OS keyring\n"
+    "• Бот переживает перезапуск\n"
+    "• Бот должен работать локально (не в облаке)\n"
+    "• Один кошелёк работает для ВСЕХ сетей\n\n"
+    "🔄 Сброс кошелька:\n"
+    "1. Останови бота\n"
+    "2. Удали файл keystore вручную\n"
+    "3. Перезапусти бота\n"
+    "4. Создай новый wallet.json\n"
+    "5. Запусти /setwallet\n\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "💱 Как это работает\n"
+    "━━━━━━━━━━━━━━━━━━\n\n"
+    "1. Создаёшь DCA план: /setdca\n"
+    "2. Бот работает 24/7 по расписанию\n"
+    "3. Автоматически отправляет USDT на FixedFloat\n"
+    "4. BTC приходит на твой адрес\n\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "ℹ️ Команды\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "/setwallet     — настроить кошелёк\n"
+    "/setdca        — создать DCA план\n"
+    "/status        — статус планов\n"
+    "/execute       — выполнить план вручную\n"
+    "/pause         — приостановить план\n"
+    "/resume        — возобновить план\n"
+    "/delete        — удалить план\n"
+    "/limits        — лимиты обмена\n"
+    "/history       — история операций\n"
+    "/walletstatus  — баланс кошелька\n"
+    "/networks      — доступные сети\n\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "🔐 Модель безопасности\n"
+    "━━━━━━━━━━━━━━━━━━\n"
+    "• Эквивалент MetaMask / always-on кошелька\n"
+    "• Все средства под ТВОИМ контролем\n"
+    "• Бот работает ТОЛЬКО локально\n"
+    "• Без облака, без третьих сторон\n"
+    "• Приватные ключи никогда не хранятся незашифрованными\n"
+    "• Пароль в OS keyring (Windows/macOS/Linux)"
+)
+
+
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
     """
@@ -904,26 +1337,7 @@ async def cmd_start(message: Message):
     username = message.from_user.username or "пользователь"
     
     await message.answer(
-        f"👋 Привет, @{username}!\n\n"
-        f"🤖 AutoDCA Bot - Автоматическая покупка BTC через FixedFloat\n\n"
-        f"📋 Доступные команды:\n\n"
-        f"🔧 Настройка:\n"
-        f"/setwallet — настроить кошелёк\n"
-        f"/setdca — создать DCA план\n"
-        f"/status — статус планов\n"
-        f"/pause — приостановить план\n"
-        f"/resume — возобновить план\n"
-        f"/delete — удалить план\n\n"
-        f"💱 Ручные операции:\n"
-        f"/execute — выполнить план вручную\n"
-        f"/networks — доступные сети\n"
-        f"/limits — лимиты обмена\n\n"
-        f"ℹ️ Информация:\n"
-        f"/help — подробная справка\n"
-        f"/walletstatus — баланс кошелька\n"
-        f"/history — история операций\n"
-        f"/ping — проверка бота\n\n"
-        f"💡 Начни с /setwallet для настройки кошелька!",
+        START_TEMPLATE.format(username=username),
         parse_mode=None  # Plain text, no markdown
     )
     logger.info(f"New user: {user_id} (@{username})")
@@ -934,65 +1348,7 @@ async def cmd_help(message: Message):
     """
     Команда /help - подробная справка по использованию бота.
     """
-    await message.answer(
-        "📖 AutoDCA Bot — Локальный Telegram бот для DCA\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "🔐 Настройка кошелька (один раз)\n"
-        "━━━━━━━━━━━━━━━━━━\n\n"
-        "1. Создай wallet.json в папке с ботом:\n\n"
-        "```json\n"
-        "{\n"
-        '  "private_key": "0xYOUR_PRIVATE_KEY",\n'
-        '  "password": "YOUR_PASSWORD"\n'
-        "}\n"
-        "```\n\n"
-        "2. Запусти:\n"
-        "/setwallet\n\n"
-        "Готово! Кошелёк настроен.\n\n"
-        "⚠️ ВАЖНО:\n"
-        "• wallet.json создаётся ОДИН РАЗ\n"
-        "• Приватный ключ удаляется после создания keystore\n"
-        "• Пароль хранится в OS keyring\n"
-        "• Бот переживает перезапуск\n"
-        "• Бот должен работать локально (не в облаке)\n"
-        "• Один кошелёк работает для ВСЕХ сетей\n\n"
-        "🔄 Сброс кошелька:\n"
-        "1. Останови бота\n"
-        "2. Удали файл keystore вручную\n"
-        "3. Перезапусти бота\n"
-        "4. Создай новый wallet.json\n"
-        "5. Запусти /setwallet\n\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "💱 Как это работает\n"
-        "━━━━━━━━━━━━━━━━━━\n\n"
-        "1. Создаёшь DCA план: /setdca\n"
-        "2. Бот работает 24/7 по расписанию\n"
-        "3. Автоматически отправляет USDT на FixedFloat\n"
-        "4. BTC приходит на твой адрес\n\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "ℹ️ Команды\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "/setwallet     — настроить кошелёк\n"
-        "/setdca        — создать DCA план\n"
-        "/status        — статус планов\n"
-        "/execute       — выполнить план вручную\n"
-        "/pause         — приостановить план\n"
-        "/resume        — возобновить план\n"
-        "/delete        — удалить план\n"
-        "/limits        — лимиты обмена\n"
-        "/history       — история операций\n"
-        "/walletstatus  — баланс кошелька\n"
-        "/networks      — доступные сети\n\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "🔐 Модель безопасности\n"
-        "━━━━━━━━━━━━━━━━━━\n"
-        "• Эквивалент MetaMask / always-on кошелька\n"
-        "• Все средства под ТВОИМ контролем\n"
-        "• Бот работает ТОЛЬКО локально\n"
-        "• Без облака, без третьих сторон\n"
-        "• Приватные ключи никогда не хранятся незашифрованными\n"
-        "• Пароль в OS keyring (Windows/macOS/Linux)"
-    )
+    await message.answer(HELP_TEXT)
 
 
 @dp.message(Command("history"))
@@ -1004,7 +1360,7 @@ async def cmd_history(message: Message):
     
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute(
-            "SELECT COUNT(*) FROM completed_orders WHERE user_id = ?",
+            "SELECT COUNT(DISTINCT order_id) FROM sent_transactions WHERE user_id = ? AND completed = 1",
             (user_id,)
         ) as cur:
             row = await cur.fetchone()
@@ -1039,48 +1395,35 @@ async def cmd_limits(message: Message):
     Команда /limits - показать лимиты обмена для USDT -> BTC для всех сетей.
     """
     try:
-        await message.answer("⏳ Получаю лимиты...")
-        
-        limits_text = "💱 Лимиты обмена USDT → BTC\n\n"
-        
-        # Проверяем лимиты для всех поддерживаемых сетей
-        for network_name, network_code in NETWORK_CODES.items():
-            try:
-                data = await ff_request_async("price", {
-                    "type": "fixed",
-                    "fromCcy": network_code,
-                    "toCcy": "BTC",
-                    "direction": "from",
-                    "amount": 50,
-                })
-                
-                from_info = data.get("from", {})
-                to_info = data.get("to", {})
-                min_amt = from_info.get("min", "—")
-                max_amt = from_info.get("max", "—")
-                to_amount = to_info.get("amount", "—")
-                
-                # Вычисляем курс: сколько USDT за 1 BTC
-                if to_amount and to_amount != "—":
-                    btc_amount = float(to_amount)  # BTC за 50 USDT
-                    rate = 50.0 / btc_amount  # USDT за 1 BTC
-                    rate_formatted = f"{rate:,.2f} USDT"
-                else:
-                    rate_formatted = "—"
-                
-                # Показываем минимум от FixedFloat и максимум бота (500)
-                limits_text += f"🔹 {network_name}:\n"
-                limits_text += f"   Минимум: {min_amt} USDT\n"
-                limits_text += f"   Максимум: 500 USDT (ограничено настройками бота)\n"
-                limits_text += f"   Курс: 1 BTC = {rate_formatted}\n\n"
-                
-            except Exception as e:
-                logger.error(f"Ошибка получения лимитов для {network_name}: {e}")
-                limits_text += f"🔹 {network_name}: ошибка\n\n"
+        # Снимок обновляется в фоне (price_refresher); ждём API только если его ещё нет
+        placeholder = None
+        if not LIMITS_SNAPSHOT_UPDATED:
+            placeholder = await message.answer("⏳ Получаю лимиты...")
+            await refresh_limits_snapshot()
+        
+        parts = ["💱 Лимиты обмена USDT → BTC\n\n"]
+        
+        for network_name, limits in LIMITS_SNAPSHOT.items():
+            if limits is None:
+                parts.append(f"🔹 {network_name}: ошибка\n\n")
+                continue
+            
+            # Показываем минимум от FixedFloat и максимум бота (500)
+            parts.append(
+                f"🔹 {network_name}:\n"
+                f"   Минимум: {limits['min']} USDT\n"
+                f"   Максимум: 500 USDT (ограничено настройками бота)\n"
+                f"   Курс: 1 BTC = {limits['rate']}\n\n"
+            )
         
-        limits_text += "💡 Лимиты обновляются в реальном времени"
+        updated_at = time.strftime('%H:%M:%S', time.localtime(LIMITS_SNAPSHOT_UPDATED))
+        parts.append(f"🕐 Обновлено: {updated_at} (каждые {LIMITS_REFRESH_INTERVAL} сек)")
         
-        await message.answer(limits_text)
+        # Заменяем "⏳ Получаю лимиты..." результатом (без второго сообщения)
+        if placeholder:
+            await placeholder.edit_text("".join(parts))
+        else:
+            await message.answer("".join(parts))
         
     except Exception as e:
         logger.error(f"Ошибка получения лимитов: {e}")
@@ -1096,28 +1439,21 @@ async def cmd_networks(message: Message):
     try:
         await message.answer("⏳ Проверяю доступность сетей на FixedFloat...")
         
-        # Получаем список всех валют из FixedFloat
-        items = await ff_request_async("ccies", {})
+        # Получаем список всех валют из FixedFloat (список меняется редко - кэшируем на 5 минут)
+        items = await ff_request_cached("ccies", {}, ttl=300)
         
         # Собираем доступные USDT сети
-        available_networks = {}
-        for item in items:
-            if item.get("coin") == "USDT":
-                code = item.get("code")
-                network = item.get("network", "")
-                available_networks[code] = network
+        available_networks = {
+            item.get("code"): item.get("network", "")
+            for item in items
+            if item.get("coin") == "USDT"
+        }
         
         # Проверяем поддерживаемые ботом сети
         text = "🌐 Доступные сети USDT:\n\n"
         text += "Поддерживаемые ботом:\n"
         
-        bot_supported = {
-            "USDT-ARB": "USDTARBITRUM",
-            "USDT-BSC": "USDTBSC",
-            "USDT-MATIC": "USDTMATIC"
-        }
-        
-        for bot_name, api_code in bot_supported.items():
+        for bot_name, api_code in _BOT_SUPPORTED.items():
             if api_code in available_networks:
                 status = "✅"
                 network_name = available_networks[api_code]
@@ -1131,7 +1467,7 @@ async def cmd_networks(message: Message):
         
         other_networks = []
         for code, network in available_networks.items():
-            if code not in bot_supported.values():
+            if code not in _BOT_SUPPORTED_CODES:
                 other_networks.append(f"• {code} - {network}")
         
         if other_networks:
@@ -1156,44 +1492,40 @@ async def cmd_execute(message: Message):
     """
     user_id = message.from_user.id
     
-    # Пытаемся извлечь порядковый номер плана из команды
-    text = message.text.strip()
-    plan_number = None
+    # Извлекаем порядковый номер плана из команды
+    try:
+        _, plan_number = parse_plan_cmd(message.text)
+    except ValueError:
+        await message.answer(_PLAN_NUMBER_INVALID_MSG)
+        return
     
-    # Пробуем формат /execute_1
-    if "_" in text:
-        try:
-            plan_number = int(text.split("_")[1])
-        except:
-            pass
-    # Пробуем формат /execute 1
-    elif " " in text:
-        try:
-            plan_number = int(text.split()[1])
-        except:
-            pass
+    # Общее соединение с БД (открывается в main)
+    db = DB
+    # Планы пользователя в том же порядке что и в /status
+    plans_query = (
+        "SELECT id, from_asset, amount, interval_hours, btc_address, active_order_id, "
+        "active_order_address, active_order_amount, active_order_expires "
+        "FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id"
+    )
+    no_plans_text = (
+        "❗️У тебя нет DCA-планов.\n\n"
+        "Создай план командой:\n"
+        "/setdca USDT-ARB 50 24 bc1q..."
+    )
     
-    # Получаем список всех планов пользователя (в том же порядке что и в /status)
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT id, from_asset, amount, interval_hours FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id",
-            (user_id,),
-        ) as cur:
+    if plan_number is None:
+        # Номер не указан - нужен список всех планов
+        async with db.execute(plans_query, (user_id,)) as cur:
             plans = await cur.fetchall()
-    
-    if not plans:
-        await message.answer(
-            "❗️У тебя нет DCA-планов.\n\n"
-            "Создай план командой:\n"
-            "/setdca USDT-ARB 50 24 bc1q..."
-        )
-        return
-    
-    # Если номер не указан - показываем список
-    if plan_number is None:
+        
+        if not plans:
+            await message.answer(no_plans_text)
+            return
+        
         if len(plans) == 1:
             # Если план один - выполняем его автоматически
             plan_number = 1
+            plan = plans[0]
         else:
             # Показываем список для выбора
             text = "📋 Выбери план для выполнения:\n\n"
@@ -1202,39 +1534,35 @@ async def cmd_execute(message: Message):
                 text += f"• /execute_{idx} - {p[1]}, {p[2]}$, раз в {interval_text}\n"
             await message.answer(text)
             return
+    else:
+        # Берём только нужный план по порядковому номеру
+        plan = None
+        if plan_number >= 1:
+            async with db.execute(plans_query + " LIMIT 1 OFFSET ?", (user_id, plan_number - 1)) as cur:
+                plan = await cur.fetchone()
+        
+        if plan is None:
+            async with db.execute(
+                "SELECT COUNT(*) FROM dca_plans WHERE user_id = ? AND deleted = 0",
+                (user_id,)
+            ) as cur:
+                plans_count = (await cur.fetchone())[0]
+            
+            if not plans_count:
+                await message.answer(no_plans_text)
+            else:
+                await message.answer(f"❌ План {plan_number} не найден\n\nУ тебя {plans_count} план(ов)")
+            return
     
-    # Проверяем что номер плана валиден
-    if plan_number < 1 or plan_number > len(plans):
-        await message.answer(f"❌ План {plan_number} не найден\n\nУ тебя {len(plans)} план(ов)")
-        return
-    
-    # Получаем реальный ID плана по порядковому номеру
-    plan_id = plans[plan_number - 1][0]
-    
-    # Получаем конкретный план по ID (только не удаленные)
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT from_asset, amount, btc_address, active_order_id, active_order_address, "
-            "active_order_amount, active_order_expires "
-            "FROM dca_plans WHERE id = ? AND user_id = ? AND deleted = 0",
-            (plan_id, user_id)
-        ) as cur:
-            row = await cur.fetchone()
-    
-    if not row:
-        await message.answer("❌ План не найден или не принадлежит тебе")
-        return
+    plan_id, from_asset, amount, _, btc_address, active_order_id, active_order_address, \
+        active_order_amount, active_order_expires = plan
     
-    from_asset, amount, btc_address, active_order_id, active_order_address, active_order_amount, active_order_expires = row
-
     # Проверяем есть ли уже активный ордер для ЭТОГО конкретного плана
     now = int(time.time())
     if active_order_id and active_order_expires and active_order_expires > now:
         # У этого плана уже есть активный неистёкший ордер
         time_left = active_order_expires - now
-        hours = time_left // 3600
-        minutes = (time_left % 3600) // 60
-        time_text = f"{hours}ч {minutes}мин" if hours > 0 else f"{minutes}мин"
+        time_text = _fmt_left(time_left)
         
         order_url = f"https://fixedfloat.com/order/{active_order_id}"
         
@@ -1251,7 +1579,7 @@ async def cmd_execute(message: Message):
         return
     elif active_order_id and active_order_expires and active_order_expires <= now:
         # Ордер истёк, очищаем его
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with DB_WRITE_LOCK:
             await db.execute(
                 "UPDATE dca_plans SET active_order_id = NULL, active_order_address = NULL, "
                 "active_order_amount = NULL, active_order_expires = NULL WHERE id = ?",
@@ -1306,12 +1634,7 @@ async def cmd_execute(message: Message):
         await message.answer(f"⏳ Создаю ордер {from_asset} на FixedFloat...")
         
         # Создаём ордер через универсальную функцию
-        data = await asyncio.to_thread(
-            create_fixedfloat_order,
-            from_asset,
-            amount,
-            btc_address
-        )
+        data = await create_fixedfloat_order_async(from_asset, amount, btc_address)
 
         if not data or not isinstance(data, dict):
             await message.answer(f"❌ Неожиданный ответ FixedFloat: {data}")
@@ -1329,38 +1652,31 @@ async def cmd_execute(message: Message):
         if not isinstance(time_left, (int, float)) or time_left < 0:
             time_left = 0
         
-        # Вычисляем часы и минуты
-        hours = int(time_left) // 3600
-        minutes = (int(time_left) % 3600) // 60
-        
         # Формируем строку времени
-        if hours > 0:
-            time_text = f"{hours}ч {minutes}мин"
-        else:
-            time_text = f"{minutes}мин"
+        time_text = _fmt_left(time_left)
 
         # Формируем ссылку на ордер
         order_url = f"https://fixedfloat.com/order/{order_id}"
         
         # Сохраняем информацию об активном ордере в БД
         order_expires = int(time.time()) + int(time_left)
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with DB_WRITE_LOCK:
             await db.execute(
                 "UPDATE dca_plans SET active_order_id = ?, active_order_address = ?, "
                 "active_order_amount = ?, active_order_expires = ? WHERE id = ?",
                 (order_id, deposit_address, f"{deposit_amount} {deposit_code}", order_expires, plan_id)
             )
             await db.commit()
-            
-            # Проверяем есть ли настроенный кошелёк для автоматической отправки
-            async with db.execute(
-                "SELECT wallet_address FROM wallets WHERE user_id = ?",
-                (user_id,)
-            ) as cur:
-                wallet_row = await cur.fetchone()
-            
-            # Проверяем есть ли пароль в памяти
-            wallet_password = _wallet_passwords.get(user_id)
+        
+        # Проверяем есть ли настроенный кошелёк для автоматической отправки
+        async with db.execute(
+            "SELECT wallet_address FROM wallets WHERE user_id = ?",
+            (user_id,)
+        ) as cur:
+            wallet_row = await cur.fetchone()
+        
+        # Проверяем есть ли пароль в памяти
+        wallet_password = _wallet_passwords.get(user_id)
         
         if wallet_row and wallet_password:
             
@@ -1392,14 +1708,14 @@ async def cmd_execute(message: Message):
             if success:
                 # Сохраняем информацию о транзакции
                 config = get_network_config(from_asset)
-                async with aiosqlite.connect(DB_PATH) as db:
+                async with DB_WRITE_LOCK:
                     await db.execute(
                         "INSERT INTO sent_transactions (user_id, plan_id, order_id, network_key, approve_tx_hash, transfer_tx_hash, amount, deposit_address) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
                         (user_id, plan_id, order_id, from_asset, approve_tx, transfer_tx, required_amount, deposit_address)
                     )
                     await db.commit()
                 
-                explorer_base = config["explorer_base"]
+                explorer_base = config.explorer_base
                 transfer_url = f"{explorer_base}{transfer_tx}" if transfer_tx else None
                 
                 msg = (
@@ -1458,6 +1774,39 @@ async def cmd_execute(message: Message):
         logger.error(f"Ошибка создания ордера для user_id={user_id}: {e}")
         await message.answer(f"❌ Ошибка при создании ордера:\n{str(e)}")
 
+
+# Шаблоны /status: блок плана и блок активного ордера
+_STATUS_PLAN_TEMPLATE = (
+    "━━━━━━━━━━━━━━\n"
+    "📌 План {idx}\n"
+    "{status_emoji} {from_asset} - {status_name}\n"
+    "💵 Сумма: {amount} USD\n"
+    "⏱ Интервал: раз в {interval}\n"
+    "🎯 BTC: {masked_addr}\n"
+    "⏰ Через: {hours_left}ч {minutes_left}мин\n"
+    "{order_block}"
+    "\nУправление этим планом:\n"
+    "/execute_{idx} - выполнить сейчас\n"
+    "/{toggle_cmd}_{idx} - {toggle_label}\n"
+    "/delete_{idx} - удалить\n"
+)
+
+_STATUS_ORDER_TEMPLATE = (
+    "\n🔥 Активный ордер:\n"
+    "ID: {order_id}\n"
+    "Ссылка: https://fixedfloat.com/order/{order_id}\n"
+    "Отправь: {order_amount}\n"
+    "На адрес: {order_address}...\n"
+    "Истекает через: {time_left}\n"
+)
+
+# active -> (эмодзи, название состояния, команда переключения, подпись команды)
+_STATUS_STATES = {
+    True: ("✅", "Активен", "pause", "приостановить"),
+    False: ("⏸", "Пауза", "resume", "возобновить"),
+}
+
+
 @dp.message(Command("status"))
 async def cmd_status(message: Message):
     """
@@ -1466,14 +1815,14 @@ async def cmd_status(message: Message):
     """
     user_id = message.from_user.id
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT id, from_asset, amount, interval_hours, btc_address, next_run, active, "
-            "active_order_id, active_order_address, active_order_amount, active_order_expires "
-            "FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id", 
-            (user_id,)
-        ) as cursor:
-            plans = await cursor.fetchall()
+    db = DB
+    async with db.execute(
+        "SELECT id, from_asset, amount, interval_hours, btc_address, next_run, active, "
+        "active_order_id, active_order_address, active_order_amount, active_order_expires "
+        "FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id", 
+        (user_id,)
+    ) as cursor:
+        plans = await cursor.fetchall()
     
     if not plans:
         await message.answer(
@@ -1486,144 +1835,142 @@ async def cmd_status(message: Message):
     # Вычисляем текущее время
     now = int(time.time())
     
-    status_text = f"📊 Твои DCA планы ({len(plans)}):\n\n"
+    parts = [f"📊 Твои DCA планы ({len(plans)}):\n\n"]
+    expired_plan_ids = []
     
     # Используем порядковый номер вместо ID из базы для понятной нумерации
-    for idx, plan in enumerate(plans, start=1):
-        plan_id, from_asset, amount, interval_hours, btc_address, next_run, active, \
-        order_id, order_address, order_amount, order_expires = plan
-        
-        # Вычисляем время до следующего запуска
-        time_left = next_run - now
-        hours_left = max(0, time_left // 3600)
-        minutes_left = max(0, (time_left % 3600) // 60)
-        
-        status_emoji = "✅" if active else "⏸"
-        status_name = "Активен" if active else "Пауза"
-        
-        masked_addr = btc_address[:10] + "..." + btc_address[-6:] if len(btc_address) > 16 else btc_address
-        
-        status_text += (
-            f"━━━━━━━━━━━━━━\n"
-            f"📌 План {idx}\n"
-            f"{status_emoji} {from_asset} - {status_name}\n"
-            f"💵 Сумма: {amount} USD\n"
-            f"⏱ Интервал: раз в {format_interval(interval_hours)}\n"
-            f"🎯 BTC: {masked_addr}\n"
-            f"⏰ Через: {hours_left}ч {minutes_left}мин\n"
-        )
+    for idx, (plan_id, from_asset, amount, interval_hours, btc_address, next_run, active,
+              order_id, order_address, order_amount, order_expires) in enumerate(plans, start=1):
+        # Время до следующего запуска
+        hours_left, rem = divmod(max(0, next_run - now), 3600)
         
-        # Проверяем есть ли активный ордер (и не истёк ли он)
+        # Блок активного ордера (если он есть и не истёк)
+        order_block = ""
         if order_id and order_expires:
             if order_expires > now:
-                # Ордер активен
-                order_time_left = order_expires - now
-                order_hours = order_time_left // 3600
-                order_minutes = (order_time_left % 3600) // 60
-                order_time_text = f"{order_hours}ч {order_minutes}мин" if order_hours > 0 else f"{order_minutes}мин"
-                
-                order_url = f"https://fixedfloat.com/order/{order_id}"
-                
-                status_text += (
-                    f"\n🔥 Активный ордер:\n"
-                    f"ID: {order_id}\n"
-                    f"Ссылка: {order_url}\n"
-                    f"Отправь: {order_amount}\n"
-                    f"На адрес: {order_address[:15]}...\n"
-                    f"Истекает через: {order_time_text}\n"
+                order_block = _STATUS_ORDER_TEMPLATE.format(
+                    order_id=order_id,
+                    order_amount=order_amount,
+                    order_address=order_address[:15],
+                    time_left=_fmt_left(order_expires - now),
                 )
             else:
-                # Ордер истёк - очищаем его в фоне
-                async def cleanup_expired_order(plan_id):
-                    async with aiosqlite.connect(DB_PATH) as db:
-                        await db.execute(
-                            "UPDATE dca_plans SET active_order_id = NULL, active_order_address = NULL, "
-                            "active_order_amount = NULL, active_order_expires = NULL WHERE id = ?",
-                            (plan_id,)
-                        )
-                        await db.commit()
-                
-                # Запускаем очистку в фоне (не блокируем ответ)
-                asyncio.create_task(cleanup_expired_order(plan_id))
-        
-        status_text += (
-            f"\nУправление этим планом:\n"
-            f"/execute_{idx} - выполнить сейчас\n"
-        )
-        
-        if active:
-            status_text += f"/pause_{idx} - приостановить\n"
-        else:
-            status_text += f"/resume_{idx} - возобновить\n"
-        
-        status_text += f"/delete_{idx} - удалить\n"
-    
-    await message.answer(status_text)
+                # Ордер истёк - очистим его одним запросом после ответа
+                expired_plan_ids.append(plan_id)
+        
+        status_emoji, status_name, toggle_cmd, toggle_label = _STATUS_STATES[bool(active)]
+        parts.append(_STATUS_PLAN_TEMPLATE.format(
+            idx=idx,
+            status_emoji=status_emoji,
+            status_name=status_name,
+            from_asset=from_asset,
+            amount=amount,
+            interval=format_interval(interval_hours),
+            masked_addr=_mask_btc(btc_address),
+            hours_left=hours_left,
+            minutes_left=rem // 60,
+            order_block=order_block,
+            toggle_cmd=toggle_cmd,
+            toggle_label=toggle_label,
+        ))
+    
+    await message.answer("".join(parts))
+    
+    # Очищаем все истёкшие ордера одним UPDATE (после ответа, не задерживая его)
+    if expired_plan_ids:
+        placeholders = ",".join("?" * len(expired_plan_ids))
+        async with DB_WRITE_LOCK:
+            await db.execute(
+                "UPDATE dca_plans SET active_order_id = NULL, active_order_address = NULL, "
+                f"active_order_amount = NULL, active_order_expires = NULL WHERE id IN ({placeholders})",
+                expired_plan_ids
+            )
+            await db.commit()
 
 
-@dp.message(lambda message: message.text and message.text.startswith("/pause"))
-async def cmd_pause(message: Message):
+# Тексты ответов /pause и /resume по новому значению active
+_SET_ACTIVE_TEXTS = {
+    0: {
+        "one": "⏸ План {plan_number} приостановлен",
+        "all": "⏸ Все DCA планы приостановлены",
+        "footer": "Автоматические покупки остановлены.\nДля возобновления: /resume",
+        "log_one": "DCA план приостановлен",
+        "log_all": "Все DCA планы приостановлены",
+    },
+    1: {
+        "one": "▶️ План {plan_number} возобновлён",
+        "all": "▶️ Все DCA планы возобновлены",
+        "footer": "Автоматические покупки снова активны.\nПроверь статус: /status",
+        "log_one": "DCA план возобновлён",
+        "log_all": "Все DCA планы возобновлены",
+    },
+}
+
+
+async def _set_active(message: Message, new_state: int):
     """
-    Команда /pause или /pause_N - приостановить автоматическое выполнение DCA плана.
-    N - порядковый номер плана (1, 2, 3), как в /status
+    Общая логика /pause и /resume: устанавливает active = new_state
+    для плана с порядковым номером N (как в /status) или для всех планов пользователя.
     """
+    texts = _SET_ACTIVE_TEXTS[new_state]
     user_id = message.from_user.id
     
-    # Пытаемся извлечь порядковый номер плана из команды
-    text = message.text.strip()
-    plan_number = None
-    
-    if "_" in text:
-        try:
-            plan_number = int(text.split("_")[1])
-        except:
-            pass
-    elif " " in text:
-        try:
-            plan_number = int(text.split()[1])
-        except:
-            pass
+    # Извлекаем порядковый номер плана из команды
+    try:
+        _, plan_number = parse_plan_cmd(message.text)
+    except ValueError:
+        await message.answer(_PLAN_NUMBER_INVALID_MSG)
+        return
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        if plan_number:
-            # Получаем список планов для конвертации номера в ID
+    db = DB
+    if plan_number is not None:
+        # Конвертируем порядковый номер в ID (выбираем только нужную строку)
+        row = None
+        if plan_number >= 1:
             async with db.execute(
-                "SELECT id FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id",
-                (user_id,)
+                "SELECT id FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id LIMIT 1 OFFSET ?",
+                (user_id, plan_number - 1)
             ) as cur:
-                plans = await cur.fetchall()
-            
-            if plan_number < 1 or plan_number > len(plans):
-                await message.answer(f"❌ План {plan_number} не найден")
-                return
-            
-            plan_id = plans[plan_number - 1][0]
-            
-            # Приостанавливаем по ID
+                row = await cur.fetchone()
+        
+        if row is None:
+            await message.answer(f"❌ План {plan_number} не найден")
+            return
+        
+        plan_id = row[0]
+        
+        # Меняем состояние по ID
+        async with DB_WRITE_LOCK:
             await db.execute(
-                "UPDATE dca_plans SET active = 0 WHERE id = ? AND user_id = ? AND deleted = 0",
-                (plan_id, user_id)
+                "UPDATE dca_plans SET active = ? WHERE id = ? AND user_id = ? AND deleted = 0",
+                (new_state, plan_id, user_id)
             )
-            msg = f"⏸ План {plan_number} приостановлен"
-        else:
-            # Приостанавливаем все планы пользователя (только не удаленные)
+            await db.commit()
+        msg = texts["one"].format(plan_number=plan_number)
+    else:
+        # Меняем состояние всех планов пользователя (только не удаленные)
+        async with DB_WRITE_LOCK:
             await db.execute(
-                "UPDATE dca_plans SET active = 0 WHERE user_id = ? AND deleted = 0",
-                (user_id,)
+                "UPDATE dca_plans SET active = ? WHERE user_id = ? AND deleted = 0",
+                (new_state, user_id)
             )
-            msg = "⏸ Все DCA планы приостановлены"
-        
-        await db.commit()
+            await db.commit()
+        msg = texts["all"]
     
-    await message.answer(
-        f"{msg}\n\n"
-        "Автоматические покупки остановлены.\n"
-        "Для возобновления: /resume"
-    )
-    if plan_number:
-        logger.info(f"DCA план приостановлен: user_id={user_id}, plan_number={plan_number}")
+    await message.answer(f"{msg}\n\n{texts['footer']}")
+    if plan_number is not None:
+        logger.info(f"{texts['log_one']}: user_id={user_id}, plan_number={plan_number}")
     else:
-        logger.info(f"Все DCA планы приостановлены: user_id={user_id}")
+        logger.info(f"{texts['log_all']}: user_id={user_id}")
+
+
+@dp.message(lambda message: message.text and message.text.startswith("/pause"))
+async def cmd_pause(message: Message):
+    """
+    Команда /pause или /pause_N - приостановить автоматическое выполнение DCA плана.
+    N - порядковый номер плана (1, 2, 3), как в /status
+    """
+    await _set_active(message, 0)
 
 
 @dp.message(lambda message: message.text and message.text.startswith("/resume"))
@@ -1632,63 +1979,7 @@ async def cmd_resume(message: Message):
     Команда /resume или /resume_N - возобновить автоматическое выполнение DCA плана.
     N - порядковый номер плана (1, 2, 3), как в /status
     """
-    user_id = message.from_user.id
-    
-    # Пытаемся извлечь порядковый номер плана из команды
-    text = message.text.strip()
-    plan_number = None
-    
-    if "_" in text:
-        try:
-            plan_number = int(text.split("_")[1])
-        except:
-            pass
-    elif " " in text:
-        try:
-            plan_number = int(text.split()[1])
-        except:
-            pass
-    
-    async with aiosqlite.connect(DB_PATH) as db:
-        if plan_number:
-            # Получаем список планов для конвертации номера в ID
-            async with db.execute(
-                "SELECT id FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id",
-                (user_id,)
-            ) as cur:
-                plans = await cur.fetchall()
-            
-            if plan_number < 1 or plan_number > len(plans):
-                await message.answer(f"❌ План {plan_number} не найден")
-                return
-            
-            plan_id = plans[plan_number - 1][0]
-            
-            # Возобновляем по ID
-            await db.execute(
-                "UPDATE dca_plans SET active = 1 WHERE id = ? AND user_id = ? AND deleted = 0",
-                (plan_id, user_id)
-            )
-            msg = f"▶️ План {plan_number} возобновлён"
-        else:
-            # Возобновляем все планы пользователя (только не удаленные)
-            await db.execute(
-                "UPDATE dca_plans SET active = 1 WHERE user_id = ? AND deleted = 0",
-                (user_id,)
-            )
-            msg = "▶️ Все DCA планы возобновлены"
-        
-        await db.commit()
-    
-    await message.answer(
-        f"{msg}\n\n"
-        "Автоматические покупки снова активны.\n"
-        "Проверь статус: /status"
-    )
-    if plan_number:
-        logger.info(f"DCA план возобновлён: user_id={user_id}, plan_number={plan_number}")
-    else:
-        logger.info(f"Все DCA планы возобновлены: user_id={user_id}")
+    await _set_active(message, 1)
 
 
 @dp.message(lambda message: message.text and message.text.startswith("/delete"))
@@ -1700,19 +1991,11 @@ async def cmd_delete(message: Message):
     user_id = message.from_user.id
     
     # Извлекаем порядковый номер плана из команды
-    text = message.text.strip()
-    plan_number = None
-    
-    if "_" in text:
-        try:
-            plan_number = int(text.split("_")[1])
-        except:
-            pass
-    elif " " in text:
-        try:
-            plan_number = int(text.split()[1])
-        except:
-            pass
+    try:
+        _, plan_number = parse_plan_cmd(message.text)
+    except ValueError:
+        await message.answer(_PLAN_NUMBER_INVALID_MSG)
+        return
     
     if plan_number is None:
         await message.answer(
@@ -1722,75 +2005,56 @@ async def cmd_delete(message: Message):
         )
         return
     
-    # Получаем список планов для конвертации номера в ID
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = DB
+    # Получаем план по порядковому номеру (только не удаленные)
+    plan = None
+    if plan_number >= 1:
         async with db.execute(
-            "SELECT id FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id",
-            (user_id,)
+            "SELECT id, from_asset, active_order_id, active_order_expires "
+            "FROM dca_plans WHERE user_id = ? AND deleted = 0 ORDER BY id LIMIT 1 OFFSET ?",
+            (user_id, plan_number - 1)
         ) as cur:
-            plans = await cur.fetchall()
+            plan = await cur.fetchone()
     
-    if plan_number < 1 or plan_number > len(plans):
+    if plan is None:
         await message.answer(f"❌ План {plan_number} не найден")
         return
     
-    plan_id = plans[plan_number - 1][0]
+    plan_id, from_asset, active_order_id, active_order_expires = plan
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Проверяем что план существует и принадлежит пользователю (только не удаленные)
-        async with db.execute(
-            "SELECT from_asset, active_order_id, active_order_expires FROM dca_plans WHERE id = ? AND user_id = ? AND deleted = 0",
-            (plan_id, user_id)
-        ) as cur:
-            row = await cur.fetchone()
-        
-        if not row:
-            await message.answer("❌ План не найден или не принадлежит тебе")
-            return
-        
-        from_asset, active_order_id, active_order_expires = row
-        
-        # Проверяем есть ли активный ордер и предупреждаем пользователя
-        if active_order_id and active_order_expires:
-            now = int(time.time())
-            if active_order_expires > now:
-                # Ордер еще действителен - помечаем план как удаленный (НЕ удаляем!)
-                # Это сохраняет информацию об активном ордере для предотвращения дубликатов
-                time_left = active_order_expires - now
-                hours = time_left // 3600
-                minutes = (time_left % 3600) // 60
-                time_text = f"{hours}ч {minutes}мин" if hours > 0 else f"{minutes}мин"
-                
-                order_url = f"https://fixedfloat.com/order/{active_order_id}"
-                
-                # Помечаем план как удаленный (мягкое удаление)
-                await db.execute(
-                    "UPDATE dca_plans SET deleted = 1, active = 0 WHERE id = ? AND user_id = ?",
-                    (plan_id, user_id)
-                )
-                await db.commit()
-                
-                await message.answer(
-                    f"🗑 План {from_asset} удалён\n\n"
-                    f"⚠️ У этого плана был активный ордер:\n"
-                    f"🆔 ID: {active_order_id}\n"
-                    f"🔗 Ссылка: {order_url}\n"
-                    f"⏰ Истекает через: {time_text}\n\n"
-                    f"💡 Ордер остаётся активным на FixedFloat.\n"
-                    f"Завершите обмен или дождитесь истечения.\n\n"
-                    f"❗️ Новый план с теми же параметрами (сеть + сумма + интервал + BTC адрес) можно создать только после истечения ордера.\n\n"
-                    f"Проверь оставшиеся планы: /status"
-                )
-                logger.info(f"DCA план с активным ордером помечен как удаленный: user_id={user_id}, plan_id={plan_id}, asset={from_asset}, order_id={active_order_id}")
-                return
-        
-        # Удаляем план без активного ордера (можно удалить физически)
+    # Помечаем план как удаленный (мягкое удаление, НЕ удаляем строку!)
+    # Это сохраняет информацию об активном ордере для предотвращения дубликатов
+    async with DB_WRITE_LOCK:
         await db.execute(
             "UPDATE dca_plans SET deleted = 1, active = 0 WHERE id = ? AND user_id = ?",
             (plan_id, user_id)
         )
         await db.commit()
     
+    # Проверяем был ли активный ордер и предупреждаем пользователя
+    if active_order_id and active_order_expires:
+        now = int(time.time())
+        if active_order_expires > now:
+            # Ордер еще действителен
+            time_left = active_order_expires - now
+            time_text = _fmt_left(time_left)
+            
+            order_url = f"https://fixedfloat.com/order/{active_order_id}"
+            
+            await message.answer(
+                f"🗑 План {from_asset} удалён\n\n"
+                f"⚠️ У этого плана был активный ордер:\n"
+                f"🆔 ID: {active_order_id}\n"
+                f"🔗 Ссылка: {order_url}\n"
+                f"⏰ Истекает через: {time_text}\n\n"
+                f"💡 Ордер остаётся активным на FixedFloat.\n"
+                f"Завершите обмен или дождитесь истечения.\n\n"
+                f"❗️ Новый план с теми же параметрами (сеть + сумма + интервал + BTC адрес) можно создать только после истечения ордера.\n\n"
+                f"Проверь оставшиеся планы: /status"
+            )
+            logger.info(f"DCA план с активным ордером помечен как удаленный: user_id={user_id}, plan_id={plan_id}, asset={from_asset}, order_id={active_order_id}")
+            return
+    
     await message.answer(
         f"🗑 План {from_asset} удалён\n\n"
         "Проверь оставшиеся планы: /status"
@@ -1864,7 +2128,6 @@ async def cmd_setwallet(message: Message):
             private_key = "0x" + private_key
         
         # Create Ethereum keystore using eth_account
-        from eth_account import Account
         account = Account.from_key(private_key)
         wallet_address = account.address
         
@@ -1942,28 +2205,39 @@ async def cmd_walletstatus(message: Message):
     status_text += f"📍 Address: {wallet_address[:10]}...{wallet_address[-6:]}\n\n"
     status_text += f"Balances on all networks:\n\n"
     
-    from networks import NETWORKS
-    for network_key in NETWORKS.keys():
+    async def fetch_balances(network_key):
+        w3 = await get_web3_instance(network_key)
+        return await asyncio.gather(
+            get_usdt_balance(w3, network_key, wallet_address),
+            get_native_balance(w3, wallet_address),
+        )
+    
+    # Балансы по всем сетям запрашиваются параллельно
+    network_keys = list(NETWORKS.keys())
+    results = await asyncio.gather(
+        *(fetch_balances(network_key) for network_key in network_keys),
+        return_exceptions=True
+    )
+    
+    for network_key, result in zip(network_keys, results):
         config = get_network_config(network_key)
         
-        try:
-            w3 = get_web3_instance(network_key)
-            usdt_balance = get_usdt_balance(w3, network_key, wallet_address)
-            native_balance = get_native_balance(w3, wallet_address)
-            
-            status_text += (
-                f"━━━━━━━━━━━━━━\n"
-                f"🌐 {config['name']}\n"
-                f"💵 USDT: {usdt_balance:.6f}\n"
-                f"⛽ {config['native_token']}: {native_balance:.6f}\n\n"
-            )
-        except Exception as e:
-            logger.error(f"Error getting balance for {network_key}: {e}")
+        if isinstance(result, BaseException):
+            logger.error(f"Error getting balance for {network_key}: {result}")
             status_text += (
                 f"━━━━━━━━━━━━━━\n"
-                f"🌐 {config['name']}\n"
-                f"❌ Error: {str(e)[:50]}\n\n"
+                f"🌐 {config.name}\n"
+                f"❌ Error: {str(result)[:50]}\n\n"
             )
+            continue
+        
+        usdt_balance, native_balance = result
+        status_text += (
+            f"━━━━━━━━━━━━━━\n"
+            f"🌐 {config.name}\n"
+            f"💵 USDT: {usdt_balance:.6f}\n"
+            f"⛽ {config.native_token}: {native_balance:.6f}\n\n"
+        )
     
     # Show password status
     has_password = user_id in _wallet_passwords
@@ -2017,6 +2291,93 @@ async def cmd_deletewallet(message: Message):
     logger.info(f"Wallet deleted: user_id={user_id}")
 
 
+# Сообщения об ошибках /setdca (статичные, собираются один раз при импорте)
+_SETDCA_ERR_FORMAT = (
+    "❌ Неверный формат\n\n"
+    "Используй:\n"
+    "/setdca СЕТЬ СУММА ИНТЕРВАЛ BTC_АДРЕС\n\n"
+    "Примеры:\n"
+    "/setdca USDT-ARB 50 24 bc1qxy2...\n"
+    "/setdca USDT-BSC 100 168 bc1qxy2...\n\n"
+    "Интервалы:\n"
+    "12 - раз в 12 часов\n"
+    "24 - раз в день\n"
+    "168 - раз в неделю\n"
+    "720 - раз в месяц\n\n"
+    "Подробнее: /help"
+)
+
+_SETDCA_ERR_ASSET = (
+    "❌ Неподдерживаемая сеть: {from_asset}\n\n"
+    "Доступные сети:\n" + "\n".join(f"• {a}" for a in NETWORK_CODES)
+)
+
+_SETDCA_ERR_AMOUNT = (
+    "❌ Неверная сумма\n\n"
+    "Максимум: 500 USDT (ограничено настройками бота)\n\n"
+    "Минимум зависит от сети, проверь /limits"
+)
+
+_SETDCA_ERR_INTERVAL = (
+    "❌ Неверный интервал\n\n"
+    "Доступные:\n"
+    "• 12 - раз в 12 часов\n"
+    "• 24 - раз в день\n"
+    "• 168 - раз в неделю (7 дней)\n"
+    "• 720 - раз в месяц (30 дней)"
+)
+
+_SETDCA_ERR_BTC_ADDRESS = (
+    "❌ Неверный BTC адрес\n\n"
+    "Проверь адрес и попробуй снова.\n"
+    "Поддерживаются форматы:\n"
+    "• Legacy (1...)\n"
+    "• SegWit (3...)\n"
+    "• Native SegWit (bc1...)"
+)
+
+# Допустимые интервалы DCA плана (в часах)
+_ALLOWED_INTERVALS = frozenset(_INTERVAL_LABELS)
+
+
+# Единственный INSERT нового плана: один текст SQL - одно закэшированное подготовленное выражение.
+# Колонки активного ордера заполняются при наследовании ордера удалённого плана, иначе NULL
+INSERT_PLAN_SQL = """
+    INSERT INTO dca_plans
+    (user_id, from_asset, amount, interval_hours, btc_address, next_run, active,
+     active_order_id, active_order_address, active_order_amount, active_order_expires)
+    VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?)
+"""
+
+# Проверки перед созданием плана в /setdca (один запрос вместо трёх):
+# - agg: один проход по НЕ удаленным планам сети - их число (plans_count) и, условной агрегацией,
+#   такой же план (сумма + интервал); /setdca не создаёт дубликатов, так что он не больше одного
+# - inh: самый свежий активный ордер удалённого плана с теми же параметрами
+PLAN_CREATE_CHECKS_SQL = """
+    SELECT
+        agg.plans_count, agg.dup_id, agg.dup_order_id, agg.dup_order_expires,
+        inh.active_order_id, inh.active_order_address, inh.active_order_amount,
+        inh.active_order_expires, inh.btc_address
+    FROM (
+        SELECT
+            COUNT(*) AS plans_count,
+            MAX(CASE WHEN amount = :amount AND interval_hours = :interval THEN id END) AS dup_id,
+            MAX(CASE WHEN amount = :amount AND interval_hours = :interval THEN active_order_id END) AS dup_order_id,
+            MAX(CASE WHEN amount = :amount AND interval_hours = :interval THEN active_order_expires END) AS dup_order_expires
+        FROM dca_plans
+        WHERE user_id = :user_id AND from_asset = :from_asset AND deleted = 0
+    ) AS agg
+    LEFT JOIN (
+        SELECT active_order_id, active_order_address, active_order_amount, active_order_expires, btc_address
+        FROM dca_plans
+        WHERE user_id = :user_id AND from_asset = :from_asset AND amount = :amount
+          AND interval_hours = :interval AND active_order_id IS NOT NULL AND deleted = 1
+        ORDER BY active_order_expires DESC
+        LIMIT 1
+    ) AS inh
+"""
+
+
 @dp.message(Command("setdca"))
 async def cmd_setdca(message: Message):
     """
@@ -2032,20 +2393,7 @@ async def cmd_setdca(message: Message):
     args = message.text.split()[1:]
     
     if len(args) != 4:
-        await message.answer(
-            "❌ Неверный формат\n\n"
-            "Используй:\n"
-            "/setdca СЕТЬ СУММА ИНТЕРВАЛ BTC_АДРЕС\n\n"
-            "Примеры:\n"
-            "/setdca USDT-ARB 50 24 bc1qxy2...\n"
-            "/setdca USDT-BSC 100 168 bc1qxy2...\n\n"
-            "Интервалы:\n"
-            "12 - раз в 12 часов\n"
-            "24 - раз в день\n"
-            "168 - раз в неделю\n"
-            "720 - раз в месяц\n\n"
-            "Подробнее: /help"
-        )
+        await message.answer(_SETDCA_ERR_FORMAT)
         return
     
     try:
@@ -2057,24 +2405,26 @@ async def cmd_setdca(message: Message):
         interval = int(interval_str)
         
         # Валидация параметров
-        allowed_assets = set(NETWORK_CODES.keys())
-        
-        if from_asset not in allowed_assets:
-            await message.answer(
-                f"❌ Неподдерживаемая сеть: {from_asset}\n\n"
-                f"Доступные сети:\n" + "\n".join(f"• {a}" for a in allowed_assets)
-            )
+        if from_asset not in _ALLOWED_ASSETS:
+            await message.answer(_SETDCA_ERR_ASSET.format(from_asset=from_asset))
             return
         
         # Базовая проверка диапазона
         if amount < 10 or amount > 500:
-            await message.answer(
-                "❌ Неверная сумма\n\n"
-                "Максимум: 500 USDT (ограничено настройками бота)\n\n"
-                "Минимум зависит от сети, проверь /limits"
-            )
+            await message.answer(_SETDCA_ERR_AMOUNT)
             return
         
+        # Локальные проверки (без сети) - до запроса лимитов FixedFloat
+        if interval not in _ALLOWED_INTERVALS:
+            await message.answer(_SETDCA_ERR_INTERVAL)
+            return
+        
+        # Валидация BTC адреса
+        if not validate_btc_address(btc_address):
+            await message.answer(_SETDCA_ERR_BTC_ADDRESS)
+            return
+        masked_addr = _mask_btc(btc_address)
+        
         # Проверка лимитов FixedFloat API
         try:
             limits = await get_fixedfloat_limits(from_asset)
@@ -2119,144 +2469,97 @@ async def cmd_setdca(message: Message):
                 )
             return
         
-        if interval not in [12, 24, 168, 720]:
-            await message.answer(
-                "❌ Неверный интервал\n\n"
-                "Доступные:\n"
-                "• 12 - раз в 12 часов\n"
-                "• 24 - раз в день\n"
-                "• 168 - раз в неделю (7 дней)\n"
-                "• 720 - раз в месяц (30 дней)"
-            )
-            return
-        
-        # Валидация BTC адреса
-        if not validate_btc_address(btc_address):
-            await message.answer(
-                "❌ Неверный BTC адрес\n\n"
-                "Проверь адрес и попробуй снова.\n"
-                "Поддерживаются форматы:\n"
-                "• Legacy (1...)\n"
-                "• SegWit (3...)\n"
-                "• Native SegWit (bc1...)"
-            )
-            return
-        
         # Сохранение плана в БД
         user_id = message.from_user.id
         next_run = int(time.time()) + (interval * 3600)
         now = int(time.time())
         
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Проверяем сколько НЕ удаленных планов уже есть для этой сети
-            async with db.execute(
-                "SELECT COUNT(*) FROM dca_plans WHERE user_id = ? AND from_asset = ? AND deleted = 0",
-                (user_id, from_asset)
-            ) as cur:
-                count_row = await cur.fetchone()
-                plans_count = count_row[0] if count_row else 0
-            
-            # Проверяем не существует ли уже такой же НЕ удаленный план (сеть + сумма + интервал)
-            async with db.execute(
-                "SELECT id, active_order_id, active_order_expires FROM dca_plans "
-                "WHERE user_id = ? AND from_asset = ? AND amount = ? AND interval_hours = ? AND deleted = 0",
-                (user_id, from_asset, amount, interval)
-            ) as cur:
-                duplicate = await cur.fetchone()
-            
-            if duplicate:
-                plan_id, order_id, order_expires = duplicate
+        db = DB
+        async with DB_WRITE_LOCK:
+            # BEGIN IMMEDIATE: проверки и INSERT - одна транзакция под блокировкой записи SQLite,
+            # поэтому дубликат не может появиться между проверкой и вставкой
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                # Одним запросом: число НЕ удаленных планов в этой сети, такой же НЕ удаленный план
+                # (сеть + сумма + интервал) и активный ордер удалённого плана с теми же параметрами
+                async with db.execute(
+                    PLAN_CREATE_CHECKS_SQL,
+                    {"user_id": user_id, "from_asset": from_asset, "amount": amount, "interval": interval}
+                ) as cur:
+                    checks = await cur.fetchone()
                 
-                # Проверяем есть ли активный ордер для этого плана
-                if order_id and order_expires and order_expires > now:
-                    time_left = order_expires - now
-                    hours = time_left // 3600
-                    minutes = (time_left % 3600) // 60
-                    time_text = f"{hours}ч {minutes}мин" if hours > 0 else f"{minutes}мин"
-                    order_url = f"https://fixedfloat.com/order/{order_id}"
-                    
-                    await message.answer(
-                        f"❌ Такой план уже существует и у него есть активный ордер!\n\n"
-                        f"📋 План: {from_asset}, {amount} USD, раз в {format_interval(interval)}\n\n"
-                        f"🔥 Активный ордер:\n"
-                        f"🆔 ID: {order_id}\n"
-                        f"🔗 Ссылка: {order_url}\n"
-                        f"⏰ Истекает через: {time_text}\n\n"
-                        f"💡 Дождись истечения ордера или используй другие параметры"
-                    )
-                    return
-                else:
-                    # План есть, но ордера нет или истёк
-                    await message.answer(
-                        f"❌ Такой план уже существует!\n\n"
-                        f"📋 План: {from_asset}, {amount} USD, раз в {format_interval(interval)}\n\n"
-                        f"💡 Используй другую сумму или интервал"
+                plans_count = checks[0]
+                duplicate = checks[1:4] if checks[1] is not None else None
+                existing_order = checks[4:9] if checks[4] is not None else None
+                
+                # Активный ордер удалённого плана наследуется только при совпадении BTC адреса
+                order_is_active = bool(existing_order and existing_order[3] and existing_order[3] > now)
+                inherited_order = (None, None, None, None)
+                if order_is_active and existing_order[4] == btc_address:
+                    inherited_order = existing_order[:4]
+                
+                # Не больше 3 планов на сеть и без дубликатов
+                if not duplicate and plans_count < 3:
+                    await db.execute(
+                        INSERT_PLAN_SQL,
+                        (user_id, from_asset, amount, interval, btc_address, next_run, *inherited_order)
                     )
-                    return
+                await db.commit()
+            except BaseException:
+                # BaseException: при отмене хендлера (CancelledError) транзакция на общем соединении
+                # иначе осталась бы открытой, и следующий BEGIN IMMEDIATE падал бы
+                await db.rollback()
+                raise
+        
+        if duplicate:
+            plan_id, order_id, order_expires = duplicate
             
-            # Проверяем лимит (не больше 3 планов на сеть)
-            if plans_count >= 3:
+            # Проверяем есть ли активный ордер для этого плана
+            if order_id and order_expires and order_expires > now:
+                time_left = order_expires - now
+                time_text = _fmt_left(time_left)
+                order_url = f"https://fixedfloat.com/order/{order_id}"
+                
                 await message.answer(
-                    f"❌ Достигнут лимит планов для {from_asset}\n\n"
-                    f"Максимум: 3 плана на одну сеть\n"
-                    f"Текущих планов: {plans_count}\n\n"
-                    f"💡 Удали один из планов: /status"
+                    f"❌ Такой план уже существует и у него есть активный ордер!\n\n"
+                    f"📋 План: {from_asset}, {amount} USD, раз в {format_interval(interval)}\n\n"
+                    f"🔥 Активный ордер:\n"
+                    f"🆔 ID: {order_id}\n"
+                    f"🔗 Ссылка: {order_url}\n"
+                    f"⏰ Истекает через: {time_text}\n\n"
+                    f"💡 Дождись истечения ордера или используй другие параметры"
                 )
                 return
-            
-            # Проверяем есть ли активный ордер для ТОЧНО ТАКОГО ЖЕ плана (сеть + сумма + интервал + BTC адрес)
-            # в удалённых планах
-            async with db.execute(
-                "SELECT active_order_id, active_order_address, active_order_amount, active_order_expires, btc_address "
-                "FROM dca_plans WHERE user_id = ? AND from_asset = ? AND amount = ? AND interval_hours = ? "
-                "AND active_order_id IS NOT NULL AND deleted = 1 "
-                "ORDER BY active_order_expires DESC LIMIT 1",
-                (user_id, from_asset, amount, interval)
-            ) as cur:
-                existing_order = await cur.fetchone()
-            
-            # Создаём новый план
-            if existing_order and existing_order[3] and existing_order[3] > now:
-                # Есть активный ордер от удалённого плана с теми же параметрами
-                order_id, order_address, order_amount, order_expires, old_btc_address = existing_order
-                
-                # ВАЖНО: Проверяем совпадение BTC адреса!
-                if old_btc_address != btc_address:
-                    # BTC адрес отличается - не наследуем ордер, создаём новый план
-                    await message.answer(
-                        f"⚠️ Найден активный ордер от удалённого плана, но BTC адрес отличается!\n\n"
-                        f"Старый адрес: {old_btc_address[:10]}...{old_btc_address[-6:]}\n"
-                        f"Новый адрес: {btc_address[:10]}...{btc_address[-6:]}\n\n"
-                        f"💡 Создаю новый план без наследования ордера.\n"
-                        f"Старый ордер остаётся активным на FixedFloat."
-                    )
-                    # Создаём план без наследования ордера
-                    await db.execute('''
-                        INSERT INTO dca_plans 
-                        (user_id, from_asset, amount, interval_hours, btc_address, next_run, active)
-                        VALUES (?, ?, ?, ?, ?, ?, 1)
-                    ''', (user_id, from_asset, amount, interval, btc_address, next_run))
-                else:
-                    # BTC адрес совпадает - наследуем ордер
-                    await db.execute('''
-                        INSERT INTO dca_plans 
-                        (user_id, from_asset, amount, interval_hours, btc_address, next_run, active,
-                         active_order_id, active_order_address, active_order_amount, active_order_expires)
-                        VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?)
-                    ''', (user_id, from_asset, amount, interval, btc_address, next_run,
-                          order_id, order_address, order_amount, order_expires))
             else:
-                # Нет активного ордера - создаём чистый план
-                await db.execute('''
-                    INSERT INTO dca_plans 
-                    (user_id, from_asset, amount, interval_hours, btc_address, next_run, active)
-                    VALUES (?, ?, ?, ?, ?, ?, 1)
-                ''', (user_id, from_asset, amount, interval, btc_address, next_run))
-            
-            await db.commit()
-            action = "создан"
+                # План есть, но ордера нет или истёк
+                await message.answer(
+                    f"❌ Такой план уже существует!\n\n"
+                    f"📋 План: {from_asset}, {amount} USD, раз в {format_interval(interval)}\n\n"
+                    f"💡 Используй другую сумму или интервал"
+                )
+                return
+        
+        # Проверяем лимит (не больше 3 планов на сеть)
+        if plans_count >= 3:
+            await message.answer(
+                f"❌ Достигнут лимит планов для {from_asset}\n\n"
+                f"Максимум: 3 плана на одну сеть\n"
+                f"Текущих планов: {plans_count}\n\n"
+                f"💡 Удали один из планов: /status"
+            )
+            return
         
-        masked_addr = btc_address[:10] + "..." + btc_address[-6:] if len(btc_address) > 16 else btc_address
+        if order_is_active and inherited_order[0] is None:
+            # ВАЖНО: BTC адрес отличается - ордер не унаследован, создан новый план
+            await message.answer(
+                f"⚠️ Найден активный ордер от удалённого плана, но BTC адрес отличается!\n\n"
+                f"Старый адрес: {_mask_btc(existing_order[4])}\n"
+                f"Новый адрес: {masked_addr}\n\n"
+                f"💡 Создаю новый план без наследования ордера.\n"
+                f"Старый ордер остаётся активным на FixedFloat."
+            )
+        
+        action = "создан"
         
         # Форматируем интервал
         interval_text = format_interval(interval)
@@ -2285,6 +2588,15 @@ async def cmd_setdca(message: Message):
 # ЗАПУСК БОТА
 # ============================================================================
 
+# Шаблон уведомления о завершённом ордере
+ORDER_COMPLETED_MSG = (
+    "✅ Ордер {order_id} обработан FixedFloat!\n\n"
+    "🎯 BTC должен быть отправлен на:\n{btc_address}\n\n"
+    "🔗 Проверь транзакции:\n{blockchair_url}\n\n"
+    "💡 Если BTC не получен, проверь статус ордера на FixedFloat"
+)
+
+
 async def order_monitor():
     """
     Фоновая задача для мониторинга завершения ордеров FixedFloat.
@@ -2296,54 +2608,44 @@ async def order_monitor():
         try:
             await asyncio.sleep(300)  # Проверка каждые 5 минут
             
+            # Проверяем через 10 минут после отправки (в реальности нужно использовать API)
+            check_before = int(time.time()) - 600
+            
             async with aiosqlite.connect(DB_PATH) as db:
                 # Получаем все отправленные транзакции, для которых ещё не проверен статус ордера
                 async with db.execute(
                     "SELECT DISTINCT st.order_id, st.user_id, dp.btc_address "
                     "FROM sent_transactions st "
                     "JOIN dca_plans dp ON st.plan_id = dp.id "
-                    "LEFT JOIN completed_orders co ON st.order_id = co.order_id "
-                    "WHERE co.order_id IS NULL AND st.transfer_tx_hash IS NOT NULL"
+                    "WHERE st.completed = 0 AND st.sent_at < ? AND st.transfer_tx_hash IS NOT NULL",
+                    (check_before,)
                 ) as cursor:
                     orders_to_check = await cursor.fetchall()
+                
+                # Note: FixedFloat API может не иметь endpoint для проверки статуса
+                # В реальной реализации нужно использовать их API или webhook
+                # Здесь мы просто помечаем как проверенные после задержки
+                # (в реальности нужно получить BTC txid из API)
+                if orders_to_check:
+                    await db.executemany(
+                        "UPDATE sent_transactions SET completed = 1 WHERE order_id = ?",
+                        [(order_id,) for order_id, _, _ in orders_to_check]
+                    )
+                    await db.commit()
             
             for order_id, user_id, btc_address in orders_to_check:
                 try:
-                    # Проверяем статус ордера через FixedFloat API
-                    # Note: FixedFloat API может не иметь endpoint для проверки статуса
-                    # В реальной реализации нужно использовать их API или webhook
-                    # Здесь мы просто помечаем как проверенные после задержки
-                    
-                    # Для демонстрации: проверяем через некоторое время после отправки
-                    async with aiosqlite.connect(DB_PATH) as db:
-                        async with db.execute(
-                            "SELECT sent_at FROM sent_transactions WHERE order_id = ? ORDER BY sent_at DESC LIMIT 1",
-                            (order_id,)
-                        ) as cur:
-                            sent_row = await cur.fetchone()
-                    
-                    if sent_row:
-                        sent_at = sent_row[0]
-                        # Проверяем через 10 минут после отправки (в реальности нужно использовать API)
-                        if int(time.time()) - sent_at > 600:
-                            # Помечаем как проверенный (в реальности нужно получить BTC txid из API)
-                            async with aiosqlite.connect(DB_PATH) as db:
-                                await db.execute(
-                                    "INSERT OR IGNORE INTO completed_orders (user_id, order_id, completed_at) VALUES (?, ?, ?)",
-                                    (user_id, order_id, int(time.time()))
-                                )
-                                await db.commit()
-                            
-                            # Отправляем уведомление (без BTC txid, так как API может не предоставлять его)
-                            blockchair_url = f"https://blockchair.com/bitcoin/address/{btc_address}"
-                            await bot.send_message(
-                                user_id,
-                                f"✅ Ордер {order_id} обработан FixedFloat!\n\n"
-                                f"🎯 BTC должен быть отправлен на:\n{btc_address}\n\n"
-                                f"🔗 Проверь транзакции:\n{blockchair_url}\n\n"
-                                f"💡 Если BTC не получен, проверь статус ордера на FixedFloat"
-                            )
-                            logger.info(f"Order {order_id} marked as completed for user {user_id}")
+                    # Отправляем уведомление (без BTC txid, так как API может не предоставлять его)
+                    blockchair_url = f"https://blockchair.com/bitcoin/address/{btc_address}"
+                    await bot.send_message(
+                        user_id,
+                        ORDER_COMPLETED_MSG.format(
+                            order_id=order_id,
+                            btc_address=btc_address,
+                            blockchair_url=blockchair_url
+                        )
+                    )
+                    logger.info(f"Order {order_id} marked as completed for user {user_id}")
                 
                 except Exception as e:
                     logger.error(f"Error checking order {order_id}: {e}")
@@ -2352,6 +2654,21 @@ async def order_monitor():
             logger.error(f"Ошибка в order monitor: {e}")
 
 
+async def price_refresher():
+    """
+    Фоновая задача обновления LIMITS_SNAPSHOT.
+    Команда /limits читает готовый снимок и не ждёт ответа FixedFloat.
+    """
+    logger.info("Price Refresher запущен")
+    
+    while True:
+        try:
+            await refresh_limits_snapshot()
+        except Exception as e:
+            logger.error(f"Ошибка в price refresher: {e}")
+        await asyncio.sleep(LIMITS_REFRESH_INTERVAL)
+
+
 async def load_passwords_at_startup():
     """
     Load passwords from OS keyring into memory cache at bot startup.
@@ -2396,6 +2713,7 @@ async def main():
     
     # Инициализация базы данных
     await init_db()
+    await open_db()
     
     # Load passwords from keyring into memory cache
     await load_passwords_at_startup()
@@ -2412,8 +2730,18 @@ async def main():
     # Запуск мониторинга завершения ордеров
     asyncio.create_task(order_monitor())
     
+    # Запуск фонового обновления лимитов для /limits
+    asyncio.create_task(price_refresher())
+    
     # Запуск обработки сообщений от Telegram
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await close_http_session()
+        await close_rpc_session()
+        await close_db()
+        clear_password_cache()
+        clear_private_key_cache()
 
 
 if __name__ == "__main__":
@@ -3,13 +3,18 @@ ERC20 USDT operations for EVM chains.
 Handles balance checks, approvals, and transfers.
 """
 
+import functools
 import logging
-from typing import Optional, Tuple
-from web3 import Web3
+from decimal import Decimal
+from typing import Optional, Tuple, Union
+import aiohttp
+from eth_abi import encode as abi_encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
 from web3.exceptions import ContractLogicError, TransactionNotFound
 from eth_account import Account
 from networks import get_network_config, get_usdt_contract_address
-from test_config import DRY_RUN, mask_sensitive_data
+from test_config import DRY_RUN, mask_address, mask_sensitive_data
 
 logger = logging.getLogger(__name__)
 
@@ -62,37 +67,121 @@ ERC20_ABI = [
 ]
 
 
-def get_web3_instance(network_key: str) -> Web3:
+# Per-network caches (network_key -> value).
+# AsyncWeb3 instances and contract objects are reused across calls; USDT decimals never change,
+# so decimals() is fetched once per network and the 10 ** decimals scale is kept alongside.
+_W3_CACHE = {}
+_CONTRACT_CACHE = {}
+_DECIMALS_CACHE = {}
+_WEI_SCALE = {}
+
+
+@functools.lru_cache(maxsize=1024)
+def _csum(address: str) -> str:
+    """Checksum an address (memoized: to_checksum_address hashes with keccak256 on every call)."""
+    return Web3.to_checksum_address(address)
+
+
+# Shared aiohttp session for all RPC endpoints (keep-alive, DNS cache) instead of web3's
+# default per-endpoint session; created on first use inside the running event loop
+RPC_MAX_CONNECTIONS = 64
+_RPC_SESSION = None
+
+
+def _get_rpc_session() -> aiohttp.ClientSession:
+    """Return the shared RPC session, creating it on first call."""
+    global _RPC_SESSION
+    if _RPC_SESSION is None or _RPC_SESSION.closed:
+        _RPC_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=RPC_MAX_CONNECTIONS, ttl_dns_cache=300),
+            raise_for_status=True,
+        )
+    return _RPC_SESSION
+
+
+async def close_rpc_session() -> None:
+    """Close the shared RPC session (call on shutdown)."""
+    global _RPC_SESSION
+    if _RPC_SESSION is not None:
+        await _RPC_SESSION.close()
+        _RPC_SESSION = None
+    _W3_CACHE.clear()
+    _CONTRACT_CACHE.clear()
+
+
+async def get_web3_instance(network_key: str) -> AsyncWeb3:
     """
-    Create Web3 instance for network.
+    Get AsyncWeb3 instance for network (created and connection-checked once, then cached).
     
     Args:
         network_key: Network key (e.g., "USDT-ARB")
     
     Returns:
-        Web3 instance
+        AsyncWeb3 instance
     """
+    w3 = _W3_CACHE.get(network_key)
+    if w3 is not None:
+        return w3
+    
     config = get_network_config(network_key)
-    w3 = Web3(Web3.HTTPProvider(config["rpc_url"]))
+    provider = AsyncHTTPProvider(config.rpc_url)
+    await provider.cache_async_session(_get_rpc_session())
+    w3 = AsyncWeb3(provider)
     
-    if not w3.is_connected():
-        raise RuntimeError(f"Failed to connect to {config['name']} RPC: {config['rpc_url']}")
+    if not await w3.is_connected():
+        raise RuntimeError(f"Failed to connect to {config.name} RPC: {config.rpc_url}")
     
+    _W3_CACHE[network_key] = w3
     return w3
 
 
-def get_usdt_contract(w3: Web3, network_key: str):
-    """Get USDT contract instance."""
+def get_usdt_contract(w3: AsyncWeb3, network_key: str):
+    """Get USDT contract instance (cached per network for the given Web3 instance)."""
+    cached = _CONTRACT_CACHE.get(network_key)
+    if cached is not None and cached[0] is w3:
+        return cached[1]
+    
     contract_address = get_usdt_contract_address(network_key)
-    return w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=ERC20_ABI)
+    contract = w3.eth.contract(address=_csum(contract_address), abi=ERC20_ABI)
+    _CONTRACT_CACHE[network_key] = (w3, contract)
+    return contract
+
+
+async def get_usdt_decimals(contract, network_key: str) -> int:
+    """Get USDT decimals for network (one RPC call per network, then cached)."""
+    decimals = _DECIMALS_CACHE.get(network_key)
+    if decimals is None:
+        decimals = await contract.functions.decimals().call()
+        _DECIMALS_CACHE[network_key] = decimals
+        _WEI_SCALE[network_key] = 10 ** decimals
+    return decimals
+
 
+async def get_usdt_scale(contract, network_key: str) -> int:
+    """Get 10 ** decimals for USDT on network (smallest units per 1 USDT)."""
+    scale = _WEI_SCALE.get(network_key)
+    if scale is None:
+        await get_usdt_decimals(contract, network_key)
+        scale = _WEI_SCALE[network_key]
+    return scale
 
-def get_usdt_balance(w3: Web3, network_key: str, address: str) -> float:
+
+async def to_usdt_units(contract, network_key: str, amount: float) -> int:
+    """
+    Convert a USDT amount to smallest units with exact decimal arithmetic.
+    
+    int(amount * scale) goes through a binary float (8.2 * 10**6 -> 8199999);
+    str() -> Decimal keeps the amount as the user typed it.
+    """
+    return int(Decimal(str(amount)) * await get_usdt_scale(contract, network_key))
+
+
+async def get_usdt_balance(w3: AsyncWeb3, network_key: str, address: str) -> float:
     """
     Get USDT balance for address.
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
         address: Wallet address
     
@@ -101,47 +190,52 @@ def get_usdt_balance(w3: Web3, network_key: str, address: str) -> float:
     """
     try:
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        balance_wei = contract.functions.balanceOf(Web3.to_checksum_address(address)).call()
-        balance = balance_wei / (10 ** decimals)
-        masked_addr = f"{address[:6]}...{address[-4:]}" if len(address) > 10 else address
-        logger.info(f"Balance check: {masked_addr} on {network_key} = {balance:.6f} USDT")
+        scale = await get_usdt_scale(contract, network_key)
+        balance_wei = await contract.functions.balanceOf(_csum(address)).call()
+        balance = balance_wei / scale
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Balance check: %s on %s = %.6f USDT", mask_address(address), network_key, balance)
         return balance
     except Exception as e:
-        masked_addr = f"{address[:6]}...{address[-4:]}" if len(address) > 10 else address
-        logger.error(f"Error getting USDT balance for {masked_addr} on {network_key}: {e}")
+        logger.error("Error getting USDT balance for %s on %s: %s", mask_address(address), network_key, e)
         raise RuntimeError(f"Failed to get USDT balance: {e}")
 
 
-def get_native_balance(w3: Web3, address: str) -> float:
+async def get_native_balance(w3: AsyncWeb3, address: str) -> float:
     """
     Get native token balance (ETH/BNB/MATIC).
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         address: Wallet address
     
     Returns:
         Native token balance in ETH/BNB/MATIC
     """
     try:
-        balance_wei = w3.eth.get_balance(Web3.to_checksum_address(address))
+        balance_wei = await w3.eth.get_balance(_csum(address))
         balance = w3.from_wei(balance_wei, "ether")
-        masked_addr = f"{address[:6]}...{address[-4:]}" if len(address) > 10 else address
-        logger.info(f"Native balance check: {masked_addr} = {float(balance):.6f}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Native balance check: %s = %.6f", mask_address(address), balance)
         return float(balance)
     except Exception as e:
-        masked_addr = f"{address[:6]}...{address[-4:]}" if len(address) > 10 else address
-        logger.error(f"Error getting native balance for {masked_addr}: {e}")
+        logger.error("Error getting native balance for %s: %s", mask_address(address), e)
         raise RuntimeError(f"Failed to get native balance: {e}")
 
 
-def estimate_gas_for_approve(w3: Web3, network_key: str, from_address: str, spender_address: str, amount: float) -> int:
+# approve(address,uint256) / transfer(address,uint256): selectors hashed once at import,
+# calldata is encoded directly instead of through contract.functions.*
+_APPROVE_SELECTOR = function_signature_to_4byte_selector("approve(address,uint256)")
+_TRANSFER_SELECTOR = function_signature_to_4byte_selector("transfer(address,uint256)")
+_ADDRESS_UINT256 = ("address", "uint256")
+
+
+async def estimate_gas_for_approve(w3: AsyncWeb3, network_key: str, from_address: str, spender_address: str, amount: float) -> int:
     """
     Estimate gas for approve transaction.
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
         from_address: Address approving
         spender_address: Address being approved
@@ -152,33 +246,31 @@ def estimate_gas_for_approve(w3: Web3, network_key: str, from_address: str, spen
     """
     try:
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        amount_wei = int(amount * (10 ** decimals))
+        amount_wei = await to_usdt_units(contract, network_key, amount)
         
-        tx = contract.functions.approve(
-            Web3.to_checksum_address(spender_address),
-            amount_wei
-        ).build_transaction({
-            "from": Web3.to_checksum_address(from_address),
-            "nonce": w3.eth.get_transaction_count(Web3.to_checksum_address(from_address)),
+        # Single eth_estimateGas on the raw calldata
+        estimated_gas = await w3.eth.estimate_gas({
+            "from": _csum(from_address),
+            "to": contract.address,
+            "data": _APPROVE_SELECTOR + abi_encode(_ADDRESS_UINT256, [_csum(spender_address), amount_wei]),
         })
-        
-        estimated_gas = w3.eth.estimate_gas(tx)
-        masked_from = f"{from_address[:6]}...{from_address[-4:]}" if len(from_address) > 10 else from_address
-        masked_spender = f"{spender_address[:6]}...{spender_address[-4:]}" if len(spender_address) > 10 else spender_address
-        logger.info(f"Gas estimation (approve): {network_key}, from={masked_from}, spender={masked_spender}, amount={amount:.6f} USDT, gas={estimated_gas}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Gas estimation (approve): %s, from=%s, spender=%s, amount=%.6f USDT, gas=%d",
+                network_key, mask_address(from_address), mask_address(spender_address), amount, estimated_gas
+            )
         return estimated_gas
     except Exception as e:
         logger.error(f"Error estimating gas for approve: {e}")
         raise RuntimeError(f"Failed to estimate gas for approve: {e}")
 
 
-def estimate_gas_for_transfer(w3: Web3, network_key: str, from_address: str, to_address: str, amount: float) -> int:
+async def estimate_gas_for_transfer(w3: AsyncWeb3, network_key: str, from_address: str, to_address: str, amount: float) -> int:
     """
     Estimate gas for transfer transaction.
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
         from_address: Sender address
         to_address: Recipient address
@@ -189,45 +281,88 @@ def estimate_gas_for_transfer(w3: Web3, network_key: str, from_address: str, to_
     """
     try:
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        amount_wei = int(amount * (10 ** decimals))
+        amount_wei = await to_usdt_units(contract, network_key, amount)
         
-        tx = contract.functions.transfer(
-            Web3.to_checksum_address(to_address),
-            amount_wei
-        ).build_transaction({
-            "from": Web3.to_checksum_address(from_address),
-            "nonce": w3.eth.get_transaction_count(Web3.to_checksum_address(from_address)),
+        # Single eth_estimateGas on the raw calldata
+        estimated_gas = await w3.eth.estimate_gas({
+            "from": _csum(from_address),
+            "to": contract.address,
+            "data": _TRANSFER_SELECTOR + abi_encode(_ADDRESS_UINT256, [_csum(to_address), amount_wei]),
         })
-        
-        estimated_gas = w3.eth.estimate_gas(tx)
-        masked_from = f"{from_address[:6]}...{from_address[-4:]}" if len(from_address) > 10 else from_address
-        masked_to = f"{to_address[:6]}...{to_address[-4:]}" if len(to_address) > 10 else to_address
-        logger.info(f"Gas estimation (transfer): {network_key}, from={masked_from}, to={masked_to}, amount={amount:.6f} USDT, gas={estimated_gas}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Gas estimation (transfer): %s, from=%s, to=%s, amount=%.6f USDT, gas=%d",
+                network_key, mask_address(from_address), mask_address(to_address), amount, estimated_gas
+            )
         return estimated_gas
     except Exception as e:
         logger.error(f"Error estimating gas for transfer: {e}")
         raise RuntimeError(f"Failed to estimate gas for transfer: {e}")
 
 
-def approve_usdt(
-    w3: Web3,
+# Local nonce counters per (network_key, address): seeded from the node once, then advanced
+# locally on every broadcast, so back-to-back sends skip the get_transaction_count round-trip.
+# reset_nonce() drops the entry after a failed, reverted or stuck send; the next tx re-reads "pending".
+_NONCE = {}
+
+
+async def _reserve_nonce(w3: AsyncWeb3, network_key: str, address: str) -> int:
+    """Take the next nonce for address (RPC only when the counter isn't seeded yet)."""
+    key = (network_key, address)
+    nonce = _NONCE.get(key)
+    if nonce is None:
+        pending = await w3.eth.get_transaction_count(address, "pending")
+        # Another coroutine may have seeded the counter while we were waiting
+        nonce = _NONCE.get(key, pending)
+    _NONCE[key] = nonce + 1
+    return nonce
+
+
+def reset_nonce(network_key: str, address: str) -> None:
+    """
+    Forget the local nonce for address (next tx re-reads it from the node).
+    Call after a send fails, reverts or times out, so a dropped tx doesn't leave a nonce gap.
+    """
+    _NONCE.pop((network_key, address), None)
+
+
+async def _sign_and_send(w3: AsyncWeb3, network_key: str, account, tx: dict) -> str:
+    """Sign and broadcast tx; on "nonce too low" re-seed the nonce from the node and retry once."""
+    for attempt in range(2):
+        try:
+            signed_tx = account.sign_transaction(tx)
+            tx_hash = await w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            return tx_hash.hex()
+        except Exception as e:
+            reset_nonce(network_key, account.address)
+            if attempt or "nonce too low" not in str(e).lower():
+                raise
+            logger.warning(f"Nonce {tx['nonce']} too low on {network_key}, re-reading from node")
+            tx["nonce"] = await _reserve_nonce(w3, network_key, account.address)
+
+
+async def approve_usdt(
+    w3: AsyncWeb3,
     network_key: str,
-    private_key: str,
+    private_key: Union[str, bytes],
     spender_address: str,
     amount: float,
-    dry_run: bool = False
+    dry_run: bool = False,
+    gas: Optional[int] = None,
+    gas_price: Optional[int] = None
 ) -> Optional[str]:
     """
     Approve USDT spending (exact amount only).
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
-        private_key: Private key (hex with 0x)
+        private_key: Private key (hex with 0x or raw bytes)
         spender_address: Address to approve
         amount: Exact amount to approve
         dry_run: If True, don't broadcast transaction
+        gas: Pre-computed gas limit (estimated if None)
+        gas_price: Pre-fetched gas price in wei (fetched if None)
     
     Returns:
         Transaction hash (None if dry_run)
@@ -240,23 +375,28 @@ def approve_usdt(
         from_address = account.address
         
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        amount_wei = int(amount * (10 ** decimals))
+        amount_wei = await to_usdt_units(contract, network_key, amount)
         
-        # Build transaction
-        tx = contract.functions.approve(
-            Web3.to_checksum_address(spender_address),
-            amount_wei
-        ).build_transaction({
+        if gas is None:
+            gas = await estimate_gas_for_approve(w3, network_key, from_address, spender_address, amount)
+        if gas_price is None:
+            gas_price = await w3.eth.gas_price
+        
+        # Assemble the legacy tx directly: selector + ABI-encoded args, no web3 build_transaction.
+        # The nonce is reserved last, once nothing before the broadcast can fail.
+        tx = {
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
-            "gas": estimate_gas_for_approve(w3, network_key, from_address, spender_address, amount),
-            "gasPrice": w3.eth.gas_price,
-            "chainId": get_network_config(network_key)["chain_id"],
-        })
+            "to": contract.address,
+            "value": 0,
+            "data": _APPROVE_SELECTOR + abi_encode(_ADDRESS_UINT256, [_csum(spender_address), amount_wei]),
+            "nonce": await _reserve_nonce(w3, network_key, from_address),
+            "gas": gas,
+            "gasPrice": gas_price,
+            "chainId": get_network_config(network_key).chain_id,
+        }
         
-        masked_from = f"{from_address[:6]}...{from_address[-4:]}" if len(from_address) > 10 else from_address
-        masked_spender = f"{spender_address[:6]}...{spender_address[-4:]}" if len(spender_address) > 10 else spender_address
+        masked_from = mask_address(from_address)
+        masked_spender = mask_address(spender_address)
         gas_price = w3.from_wei(tx["gasPrice"], "gwei")
         gas_cost = w3.from_wei(tx["gas"] * tx["gasPrice"], "ether")
         
@@ -268,15 +408,14 @@ def approve_usdt(
             logger.info(f"  Amount: {amount:.6f} USDT")
             logger.info(f"  Gas: {tx['gas']}")
             logger.info(f"  Gas Price: {gas_price:.2f} Gwei")
-            logger.info(f"  Estimated Cost: {gas_cost:.6f} {get_network_config(network_key)['native_token']}")
+            logger.info(f"  Estimated Cost: {gas_cost:.6f} {get_network_config(network_key).native_token}")
             logger.info(f"  [DRY RUN] Transaction NOT sent - would approve {amount:.6f} USDT")
+            reset_nonce(network_key, from_address)
             return None
         
         # Sign and send
         logger.info(f"Signing approve transaction: {masked_from} -> {masked_spender}, amount={amount:.6f} USDT")
-        signed_tx = account.sign_transaction(tx)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        tx_hash_hex = tx_hash.hex()
+        tx_hash_hex = await _sign_and_send(w3, network_key, account, tx)
         
         logger.info(f"Approve transaction sent: {tx_hash_hex}, gas={tx['gas']}, gasPrice={gas_price:.2f} Gwei")
         return tx_hash_hex
@@ -286,24 +425,28 @@ def approve_usdt(
         raise RuntimeError(f"Failed to approve USDT: {e}")
 
 
-def transfer_usdt(
-    w3: Web3,
+async def transfer_usdt(
+    w3: AsyncWeb3,
     network_key: str,
-    private_key: str,
+    private_key: Union[str, bytes],
     to_address: str,
     amount: float,
-    dry_run: bool = False
+    dry_run: bool = False,
+    gas: Optional[int] = None,
+    gas_price: Optional[int] = None
 ) -> Optional[str]:
     """
     Transfer USDT to address.
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
-        private_key: Private key (hex with 0x)
+        private_key: Private key (hex with 0x or raw bytes)
         to_address: Recipient address
         amount: Amount to transfer
         dry_run: If True, don't broadcast transaction
+        gas: Pre-computed gas limit (estimated if None)
+        gas_price: Pre-fetched gas price in wei (fetched if None)
     
     Returns:
         Transaction hash (None if dry_run)
@@ -316,23 +459,28 @@ def transfer_usdt(
         from_address = account.address
         
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        amount_wei = int(amount * (10 ** decimals))
+        amount_wei = await to_usdt_units(contract, network_key, amount)
         
-        # Build transaction
-        tx = contract.functions.transfer(
-            Web3.to_checksum_address(to_address),
-            amount_wei
-        ).build_transaction({
+        if gas is None:
+            gas = await estimate_gas_for_transfer(w3, network_key, from_address, to_address, amount)
+        if gas_price is None:
+            gas_price = await w3.eth.gas_price
+        
+        # Assemble the legacy tx directly: selector + ABI-encoded args, no web3 build_transaction.
+        # The nonce is reserved last, once nothing before the broadcast can fail.
+        tx = {
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
-            "gas": estimate_gas_for_transfer(w3, network_key, from_address, to_address, amount),
-            "gasPrice": w3.eth.gas_price,
-            "chainId": get_network_config(network_key)["chain_id"],
-        })
+            "to": contract.address,
+            "value": 0,
+            "data": _TRANSFER_SELECTOR + abi_encode(_ADDRESS_UINT256, [_csum(to_address), amount_wei]),
+            "nonce": await _reserve_nonce(w3, network_key, from_address),
+            "gas": gas,
+            "gasPrice": gas_price,
+            "chainId": get_network_config(network_key).chain_id,
+        }
         
-        masked_from = f"{from_address[:6]}...{from_address[-4:]}" if len(from_address) > 10 else from_address
-        masked_to = f"{to_address[:6]}...{to_address[-4:]}" if len(to_address) > 10 else to_address
+        masked_from = mask_address(from_address)
+        masked_to = mask_address(to_address)
         gas_price = w3.from_wei(tx["gasPrice"], "gwei")
         gas_cost = w3.from_wei(tx["gas"] * tx["gasPrice"], "ether")
         
@@ -344,15 +492,14 @@ def transfer_usdt(
             logger.info(f"  Amount: {amount:.6f} USDT")
             logger.info(f"  Gas: {tx['gas']}")
             logger.info(f"  Gas Price: {gas_price:.2f} Gwei")
-            logger.info(f"  Estimated Cost: {gas_cost:.6f} {get_network_config(network_key)['native_token']}")
+            logger.info(f"  Estimated Cost: {gas_cost:.6f} {get_network_config(network_key).native_token}")
             logger.info(f"  [DRY RUN] Transaction NOT sent - would transfer {amount:.6f} USDT")
+            reset_nonce(network_key, from_address)
             return None
         
         # Sign and send
         logger.info(f"Signing transfer transaction: {masked_from} -> {masked_to}, amount={amount:.6f} USDT")
-        signed_tx = account.sign_transaction(tx)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        tx_hash_hex = tx_hash.hex()
+        tx_hash_hex = await _sign_and_send(w3, network_key, account, tx)
         
         logger.info(f"Transfer transaction sent: {tx_hash_hex}, gas={tx['gas']}, gasPrice={gas_price:.2f} Gwei")
         return tx_hash_hex
@@ -362,12 +509,12 @@ def transfer_usdt(
         raise RuntimeError(f"Failed to transfer USDT: {e}")
 
 
-def check_allowance(w3: Web3, network_key: str, owner_address: str, spender_address: str) -> float:
+async def check_allowance(w3: AsyncWeb3, network_key: str, owner_address: str, spender_address: str) -> float:
     """
     Check current USDT allowance.
     
     Args:
-        w3: Web3 instance
+        w3: AsyncWeb3 instance
         network_key: Network key
         owner_address: Owner address
         spender_address: Spender address
@@ -377,12 +524,12 @@ def check_allowance(w3: Web3, network_key: str, owner_address: str, spender_addr
     """
     try:
         contract = get_usdt_contract(w3, network_key)
-        decimals = contract.functions.decimals().call()
-        allowance_wei = contract.functions.allowance(
-            Web3.to_checksum_address(owner_address),
-            Web3.to_checksum_address(spender_address)
+        scale = await get_usdt_scale(contract, network_key)
+        allowance_wei = await contract.functions.allowance(
+            _csum(owner_address),
+            _csum(spender_address)
         ).call()
-        allowance = allowance_wei / (10 ** decimals)
+        allowance = allowance_wei / scale
         return allowance
     except Exception as e:
         logger.error(f"Error checking allowance: {e}")
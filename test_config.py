@@ -3,19 +3,34 @@ Test configuration and mode management.
 Handles dry-run, mock FixedFloat, and testnet modes.
 """
 
+import functools
 import os
 import logging
-from typing import Optional, Dict, Any
+import pickle
+import re
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping
 from dotenv import load_dotenv
 
-load_dotenv()
+
+@functools.lru_cache(maxsize=None)
+def ensure_dotenv() -> None:
+    """Load .env into the environment once per process (repeat calls are no-ops)."""
+    load_dotenv()
+
+
+ensure_dotenv()
 logger = logging.getLogger(__name__)
 
-# Test modes from environment
+# Test modes from environment (read once at import)
 DRY_RUN = os.getenv("DRY_RUN", "false").lower() == "true"
 MOCK_FIXEDFLOAT = os.getenv("MOCK_FIXEDFLOAT", "false").lower() == "true"
 USE_TESTNET = os.getenv("USE_TESTNET", "false").lower() == "true"
 
+# All test modes as one bitmask: bit 0 = DRY_RUN, bit 1 = MOCK_FIXEDFLOAT, bit 2 = USE_TESTNET
+_TEST_MODE_BITS = (DRY_RUN << 0) | (MOCK_FIXEDFLOAT << 1) | (USE_TESTNET << 2)
+_ANY_TEST_MODE = _TEST_MODE_BITS != 0
+
 # Log test mode status
 if DRY_RUN:
     logger.warning("⚠️ DRY_RUN MODE ENABLED - No transactions will be broadcast")
@@ -27,7 +42,29 @@ if USE_TESTNET:
 
 def is_test_mode() -> bool:
     """Check if any test mode is enabled."""
-    return DRY_RUN or MOCK_FIXEDFLOAT or USE_TESTNET
+    return _ANY_TEST_MODE
+
+
+# Mock FixedFloat order templates, built once at import.
+# Per call only the dicts carrying dynamic fields are copied and patched.
+_ORDER_TO_TEMPLATE = {
+    "code": "BTC",
+    "network": "BITCOIN",
+    "amount": "0.001",  # Mock BTC amount
+    "address": None,
+}
+_ORDER_DATA_TEMPLATE = {
+    "id": None,
+    "type": "fixed",
+    "from": None,
+    "to": None,
+    "time": None,
+    "status": "WAIT",
+}
+_ORDER_TIME_TEMPLATE = {
+    "left": 3600,  # 1 hour
+    "expired": False,
+}
 
 
 def get_mock_fixedfloat_order(network_key: str, amount: float, btc_address: str) -> Dict[str, Any]:
@@ -42,71 +79,89 @@ def get_mock_fixedfloat_order(network_key: str, amount: float, btc_address: str)
     Returns:
         Mock order data matching FixedFloat API format
     """
-    import secrets
+    # One random read for all mock values: 8 + 20 + 32 bytes -> 120 hex chars
+    random_hex = os.urandom(60).hex()
     
     # Generate mock order ID
-    mock_order_id = f"TEST{secrets.token_hex(8).upper()}"
+    mock_order_id = "TEST" + random_hex[:16].upper()
     
     # Generate mock deposit address (valid EVM address format)
-    mock_deposit = "0x" + secrets.token_hex(20)
+    mock_deposit = "0x" + random_hex[16:56]
     
     # Generate mock BTC transaction ID
-    mock_btc_txid = secrets.token_hex(32)
+    mock_btc_txid = random_hex[56:]
     
     # Mock response structure matching FixedFloat API
-    return {
-        "code": 0,
-        "msg": "success",
-        "data": {
-            "id": mock_order_id,
-            "type": "fixed",
-            "from": {
-                "code": network_key.replace("USDT-", ""),
-                "network": network_key,
-                "amount": str(amount),
-                "address": mock_deposit,
-            },
-            "to": {
-                "code": "BTC",
-                "network": "BITCOIN",
-                "amount": "0.001",  # Mock BTC amount
-                "address": btc_address,
-            },
-            "time": {
-                "left": 3600,  # 1 hour
-                "expired": False,
-            },
-            "status": "WAIT",
-        }
+    data = _ORDER_DATA_TEMPLATE.copy()
+    data["id"] = mock_order_id
+    data["from"] = {
+        "code": network_key.replace("USDT-", ""),
+        "network": network_key,
+        "amount": str(amount),
+        "address": mock_deposit,
     }
+    data["to"] = {**_ORDER_TO_TEMPLATE, "address": btc_address}
+    data["time"] = _ORDER_TIME_TEMPLATE.copy()
+    return {"code": 0, "msg": "success", "data": data}
 
 
-def get_mock_fixedfloat_ccies() -> Dict[str, Any]:
-    """Generate mock FixedFloat ccies response."""
-    return {
-        "code": 0,
-        "msg": "success",
-        "data": [
-            {
-                "coin": "USDT",
-                "code": "USDTARBITRUM",
-                "network": "Arbitrum",
-                "status": "active",
-            },
-            {
-                "coin": "USDT",
-                "code": "USDTBSC",
-                "network": "BSC",
-                "status": "active",
-            },
-            {
-                "coin": "USDT",
-                "code": "USDTMATIC",
-                "network": "Polygon",
-                "status": "active",
-            },
-        ]
-    }
+# Static ccies response, pickled once: unpickling a fresh copy is cheaper than rebuilding the literal
+_CCIES_BLOB = pickle.dumps({
+    "code": 0,
+    "msg": "success",
+    "data": [
+        {
+            "coin": "USDT",
+            "code": "USDTARBITRUM",
+            "network": "Arbitrum",
+            "status": "active",
+        },
+        {
+            "coin": "USDT",
+            "code": "USDTBSC",
+            "network": "BSC",
+            "status": "active",
+        },
+        {
+            "coin": "USDT",
+            "code": "USDTMATIC",
+            "network": "Polygon",
+            "status": "active",
+        },
+    ]
+})
+
+
+def _freeze_ccies(response: Dict[str, Any]) -> Mapping[str, Any]:
+    """Build a read-only view of the ccies response (data becomes a tuple of read-only items)."""
+    frozen = dict(response)
+    frozen["data"] = tuple(MappingProxyType(item) for item in response["data"])
+    return MappingProxyType(frozen)
+
+
+# Shared read-only ccies response returned by default (no per-call allocation)
+_CCIES_RESPONSE = _freeze_ccies(pickle.loads(_CCIES_BLOB))
+
+
+def get_mock_fixedfloat_ccies(copy: bool = False) -> Mapping[str, Any]:
+    """
+    Return mock FixedFloat ccies response.
+    
+    Args:
+        copy: Return a fresh mutable dict instead of the shared read-only response
+    
+    Returns:
+        Read-only mapping (default) or mutable dict copy
+    """
+    if copy:
+        return pickle.loads(_CCIES_BLOB)
+    return _CCIES_RESPONSE
+
+
+_PRICE_TO_TEMPLATE = {
+    "code": "BTC",
+    "amount": "0.0001",  # Mock BTC amount
+}
 
 
 def get_mock_fixedfloat_price(network_key: str) -> Dict[str, Any]:
@@ -120,18 +175,66 @@ def get_mock_fixedfloat_price(network_key: str) -> Dict[str, Any]:
                 "min": "10.0",
                 "max": "500.0",
             },
-            "to": {
-                "code": "BTC",
-                "amount": "0.0001",  # Mock BTC amount
-            },
+            "to": _PRICE_TO_TEMPLATE.copy(),
         }
     }
 
 
+# Key names whose values are always masked (substring match, any case)
+_SENSITIVE_KEY_RE = re.compile(r"password|private|secret|key", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def _is_sensitive_key(key: str) -> bool:
+    """Check a key name against _SENSITIVE_KEY_RE (memoized: log payloads reuse a small set of key names)."""
+    return _SENSITIVE_KEY_RE.search(key) is not None
+
+
+# Replacement for strings that look like private keys (0x + 64 hex chars)
+_MASKED_KEY = "0x" + "***" * 20
+
+# Leaf types returned as-is without any isinstance checks
+_PLAIN_TYPES = frozenset((int, float, bool, type(None), bytes))
+
+
+def _mask_str(value: str) -> str:
+    """Mask a string if it looks like a private key (length compared first - cheapest check)."""
+    if len(value) == 66 and value.startswith("0x"):
+        return _MASKED_KEY
+    return value
+
+
+def mask_address(address: str) -> str:
+    """Shorten an address for logs (0x1234...abcd); short strings are returned unchanged."""
+    return f"{address[:6]}...{address[-4:]}" if len(address) > 10 else address
+
+
+def _mask_node(value: Any, stack: list) -> Any:
+    """
+    Mask a leaf value, or create an empty container for a dict/list and queue it on the stack.
+    """
+    value_type = type(value)
+    if value_type in _PLAIN_TYPES:
+        return value
+    if value_type is str:
+        return _mask_str(value)
+    if isinstance(value, dict):
+        child = {}
+    elif isinstance(value, list):
+        child = []
+    elif isinstance(value, str):
+        return _mask_str(value)
+    else:
+        return value
+    stack.append((value, child))
+    return child
+
+
 def mask_sensitive_data(data: Any) -> Any:
     """
     Mask sensitive data in logs.
     Replaces private keys, passwords, and addresses with masked versions.
+    Nested dicts/lists are walked with an explicit stack instead of recursion.
     
     Args:
         data: Data to mask (dict, list, str, etc.)
@@ -139,25 +242,24 @@ def mask_sensitive_data(data: Any) -> Any:
     Returns:
         Masked data
     """
-    if isinstance(data, dict):
-        masked = {}
-        for key, value in data.items():
-            key_lower = str(key).lower()
-            # Mask sensitive keys
-            if any(sensitive in key_lower for sensitive in ['password', 'private', 'secret', 'key']):
-                masked[key] = "***MASKED***"
-            elif key_lower == 'address' and isinstance(value, str) and len(value) > 10:
-                # Mask addresses but keep first/last chars
-                masked[key] = f"{value[:6]}...{value[-4:]}"
-            else:
-                masked[key] = mask_sensitive_data(value)
-        return masked
-    elif isinstance(data, list):
-        return [mask_sensitive_data(item) for item in data]
-    elif isinstance(data, str):
-        # Mask if looks like private key
-        if len(data) == 66 and data.startswith("0x"):
-            return "0x" + "***" * 20
-        return data
-    else:
-        return data
+    stack = []
+    root = _mask_node(data, stack)
+    
+    while stack:
+        source, target = stack.pop()
+        if type(target) is dict:
+            for key, value in source.items():
+                key_str = str(key)
+                # Mask sensitive keys
+                if _is_sensitive_key(key_str):
+                    target[key] = "***MASKED***"
+                elif isinstance(value, str) and len(value) > 10 and key_str.lower() == 'address':
+                    # Mask addresses but keep first/last chars
+                    target[key] = mask_address(value)
+                else:
+                    target[key] = _mask_node(value, stack)
+        else:
+            for item in source:
+                target.append(_mask_node(item, stack))
+    
+    return root
@@ -0,0 +1,42 @@
+"""
+Tests for parse_plan_cmd (plan number parsing for /execute, /pause, /resume, /delete).
+"""
+
+import os
+
+import pytest
+
+# bot.py needs the full runtime stack and a token at import
+for module in ("aiogram", "aiosqlite", "dotenv", "web3", "eth_account", "keyring", "orjson"):
+    pytest.importorskip(module)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST-TOKEN")
+
+from bot import parse_plan_cmd  # noqa: E402
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("/pause", ("pause", None)),
+    ("/pause_2", ("pause", 2)),
+    ("/resume 3", ("resume", 3)),
+    ("/execute_1@DcaBot", ("execute", 1)),
+    ("/delete_3@my_dca_bot", ("delete", 3)),
+    ("/pause@MyDcaBot", ("pause", None)),
+    # Out-of-range numbers are parsed; the command replies "not found"
+    ("/pause_0", ("pause", 0)),
+    ("/pause_-1", ("pause", -1)),
+])
+def test_valid_commands(text, expected):
+    assert parse_plan_cmd(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "/pausefoo",
+    "/resumeall",
+    "/executeall",
+    "/pause_x",
+    "/pause abc",
+    "/pause@botname_2",
+])
+def test_invalid_commands_never_mean_all_plans(text):
+    with pytest.raises(ValueError):
+        parse_plan_cmd(text)
@@ -4,26 +4,47 @@ User provides one private key that works across all networks.
 Password is stored in OS keyring for persistence.
 """
 
-import json
+import functools
+import hashlib
 import os
+import time
 from typing import Optional
+import orjson
 from eth_account import Account
+from eth_utils import to_checksum_address
 import keyring
 import logging
+from test_config import ensure_dotenv
 
 logger = logging.getLogger(__name__)
 
 # Directory for keystore files
 KEYSTORE_DIR = "keystores"
-os.makedirs(KEYSTORE_DIR, exist_ok=True)
 
 # Keyring service name
 KEYRING_SERVICE = "AutoDCA_Bot"
 
+# Opt-in cache of decrypted private keys (ENABLE_PK_CACHE=true): repeated decryption of the same
+# keystore/password pair within PK_CACHE_TTL seconds skips the scrypt KDF.
+# Trade-off: the plaintext key stays in process memory for up to the TTL, not only while signing.
+ensure_dotenv()
+PK_CACHE_ENABLED = os.getenv("ENABLE_PK_CACHE", "false").lower() == "true"
+PK_CACHE_TTL = 300
+# Per-process random key for the cache digests: without it a digest would let the password be
+# brute-forced offline at hash speed (instead of scrypt speed) from a memory dump + keystore file
+_PK_CACHE_SECRET = os.urandom(32)
 
+# user_ids whose keystore is known to exist (added on save or a successful stat, removed on delete),
+# so repeated checks for configured wallets don't hit the filesystem. Only positive results are cached:
+# a keystore placed outside save_keystore (manual restore, another process) is picked up on the next check
+_KNOWN_KEYSTORES = set()
+
+
+@functools.lru_cache(maxsize=4096)
 def generate_keystore_path(user_id: int) -> str:
     """
     Generate keystore file path for user (single wallet, not network-specific).
+    Memoized: the path depends only on user_id.
     
     Args:
         user_id: Telegram user ID
@@ -35,6 +56,18 @@ def generate_keystore_path(user_id: int) -> str:
     return os.path.join(KEYSTORE_DIR, filename)
 
 
+# Set once KEYSTORE_DIR is known to exist (created lazily on first save, not at import)
+_dir_ready = False
+
+
+def _ensure_dir() -> None:
+    """Create KEYSTORE_DIR on first use; later calls skip the makedirs syscalls."""
+    global _dir_ready
+    if not _dir_ready:
+        os.makedirs(KEYSTORE_DIR, exist_ok=True)
+        _dir_ready = True
+
+
 def save_keystore(keystore: dict, user_id: int) -> str:
     """
     Save keystore to file.
@@ -46,13 +79,24 @@ def save_keystore(keystore: dict, user_id: int) -> str:
     Returns:
         Path to saved keystore file
     """
+    _ensure_dir()
     filepath = generate_keystore_path(user_id)
+    tmp_path = filepath + ".tmp"
+    # Compact orjson bytes: keystores are machine-read, no pretty-printing needed
+    data = orjson.dumps(keystore)
     
-    with open(filepath, "w") as f:
-        json.dump(keystore, f, indent=2)
-    
-    # Set restrictive permissions (owner read/write only)
-    os.chmod(filepath, 0o600)
+    # Single write into a file created with restrictive permissions (owner read/write only),
+    # then atomic rename: a crash mid-write never leaves a truncated keystore behind
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        # A leftover .tmp from an interrupted save keeps its old mode - O_CREAT's mode applies only to new files
+        os.fchmod(fd, 0o600)
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, filepath)
+    _KNOWN_KEYSTORES.add(user_id)
     
     logger.info(f"Keystore saved to {filepath}")
     return filepath
@@ -68,41 +112,83 @@ def load_keystore(user_id: int) -> Optional[dict]:
     Returns:
         Keystore dictionary or None if not found
     """
-    filepath = generate_keystore_path(user_id)
-    
-    if not os.path.exists(filepath):
+    if not keystore_exists(user_id):
         return None
     
+    filepath = generate_keystore_path(user_id)
     try:
-        with open(filepath, "r") as f:
-            keystore = json.load(f)
+        with open(filepath, "rb") as f:
+            keystore = orjson.loads(f.read())
         return keystore
+    except FileNotFoundError:
+        # Removed outside the bot since it was cached
+        _KNOWN_KEYSTORES.discard(user_id)
+        return None
     except Exception as e:
         logger.error(f"Error loading keystore from {filepath}: {e}")
         return None
 
 
-def decrypt_private_key(keystore: dict, password: str) -> str:
+# blake2b(keystore + password) keyed with _PK_CACHE_SECRET -> (private key, monotonic expiry time)
+_PK_CACHE = {}
+
+
+def _pk_cache_key(keystore: dict, password: str) -> bytes:
+    """Keyed digest identifying a keystore/password pair (the password itself is not kept in the cache)."""
+    digest = hashlib.blake2b(
+        orjson.dumps(keystore, option=orjson.OPT_SORT_KEYS), digest_size=16, key=_PK_CACHE_SECRET
+    )
+    digest.update(password.encode())
+    return digest.digest()
+
+
+def clear_private_key_cache() -> None:
+    """Drop all cached private keys (called on shutdown)."""
+    _PK_CACHE.clear()
+
+
+def decrypt_private_key_bytes(keystore: dict, password: str) -> bytes:
     """
     Decrypt private key from keystore using eth_account.Account.decrypt.
+    Raw bytes go straight to Account.from_key, without a hex encode/decode round-trip.
     
     Args:
         keystore: Keystore dictionary (standard Ethereum JSON format)
         password: Decryption password
     
     Returns:
-        Private key (hex string with 0x prefix)
+        Private key (32 raw bytes)
     
     Raises:
         ValueError: If password is incorrect or keystore is invalid
     """
+    if PK_CACHE_ENABLED:
+        cache_key = _pk_cache_key(keystore, password)
+        cached = _PK_CACHE.get(cache_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+    
     try:
         # Use eth_account.Account.decrypt (standard method)
-        private_key = Account.decrypt(keystore, password)
-        return private_key.hex()
+        private_key = bytes(Account.decrypt(keystore, password))
     except Exception as e:
         logger.error(f"Error decrypting private key: {e}")
         raise ValueError(f"Incorrect password or invalid keystore: {e}")
+    
+    if PK_CACHE_ENABLED:
+        now = time.monotonic()
+        # Expired entries are dropped on each store, so the cache never outlives its TTL by much
+        for key, (_, expires) in list(_PK_CACHE.items()):
+            if expires <= now:
+                _PK_CACHE.pop(key, None)
+        _PK_CACHE[cache_key] = (private_key, now + PK_CACHE_TTL)
+    return private_key
+
+
+@functools.lru_cache(maxsize=1024)
+def _to_checksum(address: str) -> str:
+    """Checksum an address (memoized: keystore addresses never change)."""
+    return to_checksum_address(address)
 
 
 def get_wallet_address(keystore: dict) -> str:
@@ -124,8 +210,7 @@ def get_wallet_address(keystore: dict) -> str:
     if not address.startswith("0x"):
         address = "0x" + address
     
-    from web3 import Web3
-    return Web3.to_checksum_address(address)
+    return _to_checksum(address)
 
 
 def delete_keystore(user_id: int) -> bool:
@@ -140,18 +225,31 @@ def delete_keystore(user_id: int) -> bool:
     """
     filepath = generate_keystore_path(user_id)
     
-    if os.path.exists(filepath):
+    # Single syscall: remove directly instead of checking existence first
+    try:
         os.remove(filepath)
-        logger.info(f"Keystore deleted: {filepath}")
-        return True
+    except FileNotFoundError:
+        _KNOWN_KEYSTORES.discard(user_id)
+        return False
     
-    return False
+    _KNOWN_KEYSTORES.discard(user_id)
+    logger.info(f"Keystore deleted: {filepath}")
+    return True
 
 
 def keystore_exists(user_id: int) -> bool:
-    """Check if keystore exists for user."""
-    filepath = generate_keystore_path(user_id)
-    return os.path.exists(filepath)
+    """Check if keystore exists for user (no stat once it is known to exist)."""
+    if user_id in _KNOWN_KEYSTORES:
+        return True
+    if os.path.exists(generate_keystore_path(user_id)):
+        _KNOWN_KEYSTORES.add(user_id)
+        return True
+    return False
+
+
+# Process-local copy of keyring passwords (user_id -> password): the OS keyring is an IPC call
+# (Secret Service D-Bus / Keychain), so each password is fetched from it at most once
+_PASSWORD_CACHE = {}
 
 
 def save_password_to_keyring(user_id: int, password: str) -> None:
@@ -164,6 +262,7 @@ def save_password_to_keyring(user_id: int, password: str) -> None:
     """
     username = f"user_{user_id}"
     keyring.set_password(KEYRING_SERVICE, username, password)
+    _PASSWORD_CACHE[user_id] = password
     logger.info(f"Wallet password saved to keyring for user {user_id}")
 
 
@@ -177,9 +276,14 @@ def load_password_from_keyring(user_id: int) -> Optional[str]:
     Returns:
         Password or None if not found
     """
+    password = _PASSWORD_CACHE.get(user_id)
+    if password is not None:
+        return password
+    
     username = f"user_{user_id}"
     password = keyring.get_password(KEYRING_SERVICE, username)
     if password:
+        _PASSWORD_CACHE[user_id] = password
         logger.info(f"Wallet password loaded from keyring for user {user_id}")
     return password
 
@@ -191,9 +295,15 @@ def delete_password_from_keyring(user_id: int) -> None:
     Args:
         user_id: Telegram user ID
     """
+    _PASSWORD_CACHE.pop(user_id, None)
     username = f"user_{user_id}"
     try:
         keyring.delete_password(KEYRING_SERVICE, username)
         logger.info(f"Wallet password deleted from keyring for user {user_id}")
     except keyring.errors.PasswordDeleteError:
         pass  # Password was not set
+
+
+def clear_password_cache() -> None:
+    """Drop all cached keyring passwords (call on shutdown)."""
+    _PASSWORD_CACHE.clear()